@@ -0,0 +1,62 @@
+"""Import-time budget for the command-line entry points.
+
+Imports each entry point in a fresh interpreter and fails if it takes longer than `--budget-ms` or loads a
+heavy dependency that only some providers need (torch, transformers, pydantic, the OpenAI client). Those
+are imported on first use, so `--responses-file` scoring and the mock provider never pay for them.
+
+    python benchmarks/import_budget.py --budget-ms 500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = ['main', 'leaderboard']
+HEAVY_MODULES = ['torch', 'transformers', 'pydantic', 'openai', 'httpx']
+
+PROBE = '''
+import json, resource, sys, time
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started = time.perf_counter()
+import {module}
+print(json.dumps({{
+    "import_ms": (time.perf_counter() - started) * 1000,
+    "rss_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss) / 1024,
+    "heavy": [m for m in {heavy!r} if m in sys.modules]
+}}))
+'''
+
+
+def measure(module: str) -> dict:
+    """Import `module` in a fresh interpreter and report the time, RSS growth and heavy modules it loaded."""
+    output = subprocess.run([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                            cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that the entry points import quickly and without heavy dependencies.")
+    parser.add_argument('--budget-ms', type=float, default=500.0, help="Maximum import time per entry point.")
+    parser.add_argument('--repeat', type=int, default=3, help="Imports per entry point; the fastest is compared to the budget.")
+    args = parser.parse_args()
+
+    failures = []
+    for module in ENTRY_POINTS:
+        runs = [measure(module) for _ in range(args.repeat)]
+        best = min(runs, key=lambda run: run['import_ms'])
+        print(f"{module:<12}{best['import_ms']:>9.1f} ms{best['rss_mb']:>9.1f} MB  heavy: {', '.join(best['heavy']) or 'none'}")
+        if best['import_ms'] > args.budget_ms:
+            failures.append(f"{module} took {best['import_ms']:.1f} ms to import (budget {args.budget_ms:.0f} ms)")
+        if best['heavy']:
+            failures.append(f"{module} imported {', '.join(best['heavy'])} at startup")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
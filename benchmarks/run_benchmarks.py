@@ -0,0 +1,130 @@
+"""Offline performance benchmarks for the orchestration layer.
+
+Drives DataLoader generation, Evaluator judging and ResultParser scoring end to end on the bundled
+questions, replicated `--scale` times, against the deterministic mock provider and mock judge.
+Reports throughput, tail latency and peak memory for each execution mode.
+
+    python benchmarks/run_benchmarks.py --scale 4 --attempts 3 --latency 0.02
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.data_loader import DataLoader
+from src.evaluator import Evaluator, JudgeResponse
+from src.result_parser import ResultParser
+from src.pipeline import Pipeline
+from src.async_engine import AsyncEngine
+from src.instrumentation import Recorder
+from src.models.mock import MockModel
+
+QUESTIONS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'benchmark_questions.jsonl')
+
+
+def load_conversations(scale: int):
+    data_loader = DataLoader(QUESTIONS_FILE)
+    data_loader.load_data()
+    base = data_loader.conversations
+    data_loader.conversations = [
+        dataclasses.replace(c, question_id=f"{c.question_id}-{copy}") if copy else c
+        for copy in range(scale) for c in base
+    ]
+    return data_loader
+
+
+def run_threaded(data_loader, generator, judge, args, recorder):
+    data_loader.generate_responses(generator, attempts=args.attempts, max_workers=args.workers)
+    evaluator = Evaluator(data_loader.conversations, data_loader.responses, evaluation_model=judge)
+    evaluator.recorder = recorder
+    return evaluator.evaluate(max_workers=args.workers)
+
+
+def run_async(data_loader, generator, judge, args, recorder):
+    gen_engine = AsyncEngine(max_concurrency=args.concurrency, base_delay=0.01)
+    asyncio.run(data_loader.agenerate_responses(generator, gen_engine, attempts=args.attempts))
+    evaluator = Evaluator(data_loader.conversations, data_loader.responses, evaluation_model=judge)
+    evaluator.recorder = recorder
+    eval_engine = AsyncEngine(max_concurrency=args.concurrency, base_delay=0.01)
+    return asyncio.run(evaluator.aevaluate(eval_engine))
+
+
+def run_pipeline(data_loader, generator, judge, args, recorder):
+    evaluator = Evaluator(data_loader.conversations, data_loader.responses, evaluation_model=judge)
+    evaluator.recorder = recorder
+    pipeline = Pipeline(data_loader, evaluator, ResultParser())
+    return pipeline.run(generator, attempts=args.attempts, gen_workers=args.workers, eval_workers=args.workers)
+
+
+MODES = {'threaded': run_threaded, 'async': run_async, 'pipeline': run_pipeline}
+
+
+def benchmark(mode: str, args) -> dict:
+    data_loader = load_conversations(args.scale)
+    recorder = Recorder()
+    data_loader.recorder = recorder
+    generator = MockModel(latency=args.latency, error_rate=args.error_rate,
+                          rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    judge = MockModel(model='mock-judge', latency=args.latency, error_rate=args.error_rate,
+                      rate_limit_rate=args.rate_limit_rate, seed=args.seed + 1, response_format=JudgeResponse)
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    results = MODES[mode](data_loader, generator, judge, args, recorder)
+    scoring_started = time.perf_counter()
+    scores = ResultParser(results).calculate_scores()
+    finished = time.perf_counter()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    summary = recorder.summary()
+    elapsed = finished - started
+    return {
+        'mode': mode,
+        'conversations': len(data_loader.conversations),
+        'results': len(results),
+        'elapsed_s': elapsed,
+        'calls_per_s': sum(s['calls'] for s in summary.values()) / elapsed,
+        'scoring_s': finished - scoring_started,
+        'peak_memory_mb': peak / 2 ** 20,
+        'overall_score': scores['overall_score'],
+        'phases': summary
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline orchestration benchmarks using the mock provider and judge.")
+    parser.add_argument('--modes', nargs='*', default=list(MODES), choices=list(MODES))
+    parser.add_argument('--scale', type=int, default=1, help="Replicate the bundled questions this many times.")
+    parser.add_argument('--attempts', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=32, help="Thread pool size for the threaded and pipeline modes.")
+    parser.add_argument('--concurrency', type=int, default=256, help="Maximum in-flight calls for the async mode.")
+    parser.add_argument('--latency', type=float, default=0.01, help="Median mock call latency in seconds.")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, help="Optional path to save the full report as JSON.")
+    args = parser.parse_args()
+
+    reports = [benchmark(mode, args) for mode in args.modes]
+
+    print(f"\n{'mode':<10}{'results':>9}{'elapsed s':>11}{'calls/s':>10}{'gen p99 ms':>12}{'judge p99 ms':>14}{'peak MB':>9}")
+    for report in reports:
+        gen_p99 = report['phases'].get('generate', {}).get('wall_p99') or 0
+        judge_p99 = report['phases'].get('judge', {}).get('wall_p99') or 0
+        print(f"{report['mode']:<10}{report['results']:>9}{report['elapsed_s']:>11.2f}{report['calls_per_s']:>10.1f}"
+              f"{gen_p99 * 1000:>12.1f}{judge_p99 * 1000:>14.1f}{report['peak_memory_mb']:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
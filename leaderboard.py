@@ -0,0 +1,58 @@
+import argparse
+from dotenv import load_dotenv
+import os
+from src.data_loader import DataLoader
+from src.cache import VerdictCache
+from src.leaderboard import Leaderboard
+from src.models.clients import configure_pool
+
+def main():
+    load_dotenv(dotenv_path="./.env",override=True)
+
+    parser = argparse.ArgumentParser(description="Score several models' response files and build a comparative leaderboard.")
+
+    parser.add_argument('--responses-glob', type=str, default='./data/final_model_responses/*.jsonl',
+                        help="Glob matching the JSONL response files to score, one file per model.")
+    parser.add_argument('--output-file', type=str, required=True,
+                        help="Path to save the leaderboard table.")
+    parser.add_argument('--max-workers', type=int, default=1,
+                        help="Number of parallel workers shared by all models' judge calls.")
+    parser.add_argument('--judge-cache', type=str,
+                        help="Path to a SQLite file used to cache judge verdicts across runs.")
+    parser.add_argument('--judge-cache-size', type=int, default=100000,
+                        help="Maximum number of verdicts kept in the judge cache before evicting the least recently used.")
+
+    args = parser.parse_args()
+
+    configure_pool(args.max_workers)
+
+    data_loader = DataLoader('./data/benchmark_questions.jsonl')
+    data_loader.load_data()
+
+    cache = None
+    if args.judge_cache:
+        cache_dir = os.path.dirname(args.judge_cache)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        cache = VerdictCache(args.judge_cache, max_entries=args.judge_cache_size)
+
+    leaderboard = Leaderboard.from_glob(data_loader, args.responses_glob, cache=cache)
+    scores = leaderboard.run(max_workers=args.max_workers)
+    print(f"Judge calls: {leaderboard.judge.calls} sent, {leaderboard.judge.deduplicated} deduplicated")
+    if cache is not None:
+        print(f"Judge cache: {cache.hits} hits, {cache.misses} misses")
+        cache.close()
+
+    output_dir = os.path.dirname(args.output_file)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+
+    table = Leaderboard.format_table(scores)
+    with open(args.output_file, 'w') as f:
+        f.write(table)
+
+    print(table)
+    print(f"Leaderboard saved to {args.output_file}")
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,24 @@
 import argparse
+import asyncio
+import sys
+import time
 from dotenv import load_dotenv
 import os
 from src.data_loader import DataLoader
 from src.evaluator import Evaluator
+from src.cache import VerdictCache
+from src.async_engine import AsyncEngine
+from src.pipeline import Pipeline
+from src.journal import RunJournal
+from src.sharding import ShardedRun
+from src.baseline import Baseline
+from src.batch import OpenAIBatchTransport
+from src.results_store import ResultsStore
+from src.records import configure_spill
+from src.instrumentation import Recorder
 from src.result_parser import ResultParser
 from src.models.factory import ModelFactory
+from src.models.clients import configure_pool
 
 def parse_provider_args(provider_args):
     """Parse key-value pairs from --provider-args."""
@@ -15,6 +29,28 @@ def parse_provider_args(provider_args):
             args_dict[key] = value
     return args_dict
 
+def write_metrics(args, recorder):
+    """Save the --metrics-file summary and --trace-file trace collected by `recorder`."""
+    if args.metrics_file:
+        prices = {}
+        if args.gen_prices:
+            prices['generate'] = tuple(args.gen_prices)
+        if args.judge_prices:
+            prices['judge'] = tuple(args.judge_prices)
+        recorder.write_summary(args.metrics_file, prices=prices)
+    if args.trace_file:
+        recorder.export_chrome_trace(args.trace_file)
+
+def format_change(before, after):
+    """'before% -> after% (+change)' for the baseline delta report; a missing side is shown as NA."""
+    if before is None or after is None:
+        return f"{'NA' if before is None else f'{before:.2f}%'} -> {'NA' if after is None else f'{after:.2f}%'}"
+    return f"{before:.2f}% -> {after:.2f}% ({after - before:+.2f})"
+
+# Arguments that define what a run computes; they are saved with the journal and restored on --resume
+RESUMABLE_ARGS = ['responses_file', 'model_provider', 'provider_args', 'judge_provider', 'judge_args', 'attempts',
+                  'baseline']
+
 def main():
     load_dotenv(dotenv_path="./.env",override=True)
 
@@ -23,11 +59,17 @@ def main():
     parser.add_argument('--output-file', type=str, required=True,
                         help="Path to save the final evaluation stats and scores.")
     parser.add_argument('--responses-file', type=str,
-                        help="Path to the JSONL file containing model responses.")
+                        help="Path or glob of the JSONL file(s) containing model responses (.gz and .zst are supported).")
+    parser.add_argument('--mmap', action='store_true',
+                        help="Memory-map uncompressed input files instead of reading them through a buffer.")
     parser.add_argument('--model-provider', type=str,
                         help="Specify the model provider for generating responses.")
     parser.add_argument('--provider-args', type=str, nargs='*',
                         help="Provider-specific arguments in key=value format.")
+    parser.add_argument('--judge-provider', type=str,
+                        help="Model provider to use as the judge instead of the default GPT-4o judge (e.g. 'mock').")
+    parser.add_argument('--judge-args', type=str, nargs='*',
+                        help="Judge provider arguments in key=value format.")
     parser.add_argument('--attempts', type=int, default=1,
                         help="Number of attempts to generate for each conversation")
     parser.add_argument('--max-workers_response_gen', type=int, default=1,
@@ -36,9 +78,125 @@ def main():
                         help="Number of parallel workers to use for evaluation.")
     parser.add_argument('--raw', type=str,
                         help="Path to save detailed raw output including all responses and evaluations")
+    parser.add_argument('--results-store', type=str,
+                        help="Directory of a columnar results store to add this run to.")
+    parser.add_argument('--run-id', type=str,
+                        help="Name of this run in the --results-store. Defaults to a timestamp.")
+    parser.add_argument('--overwrite-run', action='store_true',
+                        help="Replace the run with the same --run-id in the --results-store instead of refusing.")
+    parser.add_argument('--spill-dir', type=str,
+                        help="Directory for temporary files holding response and judge reasoning text, to keep it out of memory on large runs.")
+    parser.add_argument('--metrics-file', type=str,
+                        help="Path to save a JSON summary of per-call latency (p50/p95/p99), tokens, retries and errors.")
+    parser.add_argument('--trace-file', type=str,
+                        help="Path to save every generation and judge call as a Chrome trace (chrome://tracing or Perfetto).")
+    parser.add_argument('--gen-prices', type=float, nargs=2, metavar=('PROMPT', 'COMPLETION'),
+                        help="USD per 1M prompt and completion tokens for the generating model, used for per-axis cost in --metrics-file.")
+    parser.add_argument('--judge-prices', type=float, nargs=2, metavar=('PROMPT', 'COMPLETION'),
+                        help="USD per 1M prompt and completion tokens for the judge, used for per-axis cost in --metrics-file.")
+    parser.add_argument('--judge-cache', type=str,
+                        help="Path to a SQLite file used to cache judge verdicts across runs.")
+    parser.add_argument('--judge-cache-size', type=int, default=100000,
+                        help="Maximum number of verdicts kept in the judge cache before evicting the least recently used.")
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help="Run generation and evaluation on an asyncio event loop instead of thread pools.")
+    parser.add_argument('--pass-at-k', type=int, nargs='*', default=[],
+                        help="Also report unbiased pass@k estimates for these values of k.")
+    parser.add_argument('--run-dir', type=str,
+                        help="Directory in which to journal every response and verdict as it completes.")
+    parser.add_argument('--resume', type=str, metavar='RUN_DIR',
+                        help="Resume an interrupted run from its --run-dir, only doing the missing (question, attempt) pairs.")
+    parser.add_argument('--baseline', type=str, metavar='RAW_CSV',
+                        help="--raw output of a previous run; unchanged responses and verdicts are reused and a per-axis delta is reported.")
+    parser.add_argument('--num-shards', type=int, default=1,
+                        help="Split the benchmark into this many shards by question ID hash, each run in its own process.")
+    parser.add_argument('--shard-dir', type=str,
+                        help="Directory shared by all shards of a --num-shards run, holding each shard's journal and results.")
+    parser.add_argument('--shard-index', type=int,
+                        help="Run only this shard (0-based) and save it to --shard-dir, e.g. on one node of a cluster.")
+    parser.add_argument('--shard-processes', type=int,
+                        help="Number of unfinished shards to run at once as local processes. Defaults to --num-shards; 0 only merges finished shards.")
+    parser.add_argument('--judge-batch', type=str, metavar='WORK_DIR',
+                        help="Submit all judge requests through the OpenAI Batch API, writing the batch file to WORK_DIR.")
+    parser.add_argument('--batch-poll-interval', type=float, default=30.0,
+                        help="Seconds between batch status checks in --judge-batch mode.")
+    parser.add_argument('--early-exit', action='store_true',
+                        help="Judge each question's attempts in order and stop at the first pass (with --pipeline, also stop generating). Per-attempt statistics are not kept.")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Judge each response as soon as it is generated instead of running the two phases back to back.")
+    parser.add_argument('--queue-size', type=int, default=64,
+                        help="Maximum number of generated responses waiting for the judge in --pipeline mode.")
+    parser.add_argument('--max-concurrency', type=int, default=256,
+                        help="Upper bound on in-flight requests per provider in --async mode.")
+    parser.add_argument('--gen-rpm', type=int,
+                        help="Requests-per-minute limit for the response generation provider in --async mode.")
+    parser.add_argument('--gen-tpm', type=int,
+                        help="Tokens-per-minute limit for the response generation provider in --async mode.")
+    parser.add_argument('--eval-rpm', type=int,
+                        help="Requests-per-minute limit for the judge in --async mode.")
+    parser.add_argument('--eval-tpm', type=int,
+                        help="Tokens-per-minute limit for the judge in --async mode.")
 
     args = parser.parse_args()
 
+    run_id = None
+    if args.results_store:
+        # Name the run up front so a clash is reported before any generation or judging
+        store = ResultsStore(args.results_store)
+        if args.run_id:
+            run_id = args.run_id
+            if store.has_run(run_id) and not args.overwrite_run:
+                parser.error(f"Run {run_id} already exists in {args.results_store}; pass --overwrite-run to replace it")
+        else:
+            run_id = stamp = time.strftime('%Y%m%d-%H%M%S')
+            suffix = 1
+            while store.has_run(run_id):
+                suffix += 1
+                run_id = f"{stamp}-{suffix}"
+
+    sharded = None
+    if args.num_shards > 1 or args.shard_index is not None:
+        if not args.shard_dir:
+            parser.error("--num-shards and --shard-index require a --shard-dir")
+        if args.shard_index is not None and not 0 <= args.shard_index < args.num_shards:
+            parser.error("--shard-index must be between 0 and --num-shards - 1")
+        if args.run_dir or args.resume:
+            parser.error("Each shard journals to its own directory under --shard-dir; do not pass --run-dir or --resume")
+        sharded = ShardedRun(args.shard_dir, args.num_shards)
+        try:
+            sharded.claim(dict({key: getattr(args, key) for key in RESUMABLE_ARGS}, num_shards=args.num_shards))
+        except ValueError as e:
+            parser.error(f"{e}; choose a new --shard-dir")
+
+    journal = None
+    if sharded is not None and args.shard_index is not None:
+        # Rerunning a shard resumes it from its journal
+        shard_dir = sharded.shard_dir(args.shard_index)
+        journal = RunJournal(shard_dir)
+        try:
+            journal.claim({key: getattr(args, key) for key in RESUMABLE_ARGS})
+        except ValueError as e:
+            parser.error(f"{e}; choose a new --shard-dir")
+        if args.metrics_file:
+            args.metrics_file = os.path.join(shard_dir, 'metrics.json')
+        if args.trace_file:
+            args.trace_file = os.path.join(shard_dir, 'trace.json')
+    elif args.resume:
+        journal = RunJournal(args.resume)
+        config = journal.load_config()
+        if not config:
+            parser.error(f"No run found to resume in {args.resume}")
+        for key in RESUMABLE_ARGS:
+            setattr(args, key, config.get(key))
+        print(f"Resuming run in {args.resume}")
+    elif args.run_dir:
+        journal = RunJournal(args.run_dir)
+        try:
+            if journal.claim({key: getattr(args, key) for key in RESUMABLE_ARGS}):
+                print(f"Resuming run in {args.run_dir}")
+        except ValueError as e:
+            parser.error(f"{e}; pass --resume {args.run_dir} to continue that run, or choose a new --run-dir")
+
     # Validate the --raw argument
     if args.raw:
         if not args.raw.lower().endswith('.csv'):
@@ -47,29 +205,130 @@ def main():
         # Ensure the directory exists
         os.makedirs(os.path.dirname(args.raw), exist_ok=True)
 
+    # Size the shared HTTP connection pools to the most concurrent requests any phase will issue
+    configure_pool(max(args.max_workers_response_gen, args.max_workers_eval,
+                       args.max_concurrency if args.async_mode else 1))
+
+    if args.spill_dir:
+        os.makedirs(args.spill_dir, exist_ok=True)
+        configure_spill(args.spill_dir)
+
     input_file = './data/benchmark_questions.jsonl'
 
     data_loader = DataLoader(input_file)
-    data_loader.load_data()
+    data_loader.load_data(use_mmap=args.mmap)
+    if sharded is not None and args.shard_index is not None:
+        data_loader.conversations = sharded.select(data_loader.conversations, args.shard_index)
+    if journal is not None:
+        data_loader.use_journal(journal)
+    baseline = Baseline(args.baseline) if args.baseline else None
+    if baseline is not None:
+        # Journaled responses take precedence over the baseline's
+        for question_id, attempts in baseline.responses(data_loader.conversations).items():
+            completed = data_loader.completed.setdefault(question_id, attempts)
+            if completed is not attempts:
+                for attempt in attempts:
+                    completed.setdefault(attempt, attempts[attempt])
+    recorder = Recorder() if args.metrics_file or args.trace_file else None
+    data_loader.recorder = recorder
 
-    if args.responses_file:
-        data_loader.load_responses(args.responses_file)
+    if args.pipeline and (args.async_mode or args.responses_file):
+        parser.error("--pipeline generates responses with thread pools and cannot be combined with --async or --responses-file")
+    if args.judge_batch and args.pipeline:
+        parser.error("--judge-batch judges all responses at once and cannot be combined with --pipeline")
+    if args.judge_batch and args.early_exit:
+        parser.error("--judge-batch judges all responses at once and cannot be combined with --early-exit")
+    if args.judge_batch and args.judge_provider:
+        from src.models.openai import OpenAIModel
+        try:
+            judge_class = ModelFactory.provider_class(args.judge_provider)
+        except ValueError as e:
+            parser.error(str(e))
+        if not issubclass(judge_class, OpenAIModel):
+            parser.error("--judge-batch submits through the OpenAI Batch API and needs an OpenAI judge, "
+                         f"not --judge-provider {args.judge_provider}")
+
+    if sharded is not None and args.shard_index is None:
+        pending = sharded.pending()
+        processes = args.num_shards if args.shard_processes is None else args.shard_processes
+        if pending and processes:
+            print(f"Running shards {pending} of {args.num_shards} with up to {processes} local processes")
+            sharded.launch(sys.argv[1:], pending, max_processes=processes)
+        conversations = data_loader.get_conversations()
+        responses, results = sharded.merge(conversations)
+        result_parser = ResultParser(results)
+        # Each shard saved its own metrics and trace in its shard directory
+        recorder = None
+        print(f"Merged {args.num_shards} shards from {args.shard_dir}")
     else:
-        if not args.model_provider:
-            raise ValueError("You must specify a --model-provider if generating responses.")
+        cache = None
+        if args.judge_cache:
+            cache_dir = os.path.dirname(args.judge_cache)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            cache = VerdictCache(args.judge_cache, max_entries=args.judge_cache_size)
+
+        if args.responses_file:
+            data_loader.load_responses(args.responses_file, use_mmap=args.mmap)
+        else:
+            if not args.model_provider:
+                raise ValueError("You must specify a --model-provider if generating responses.")
         
-        provider_args = parse_provider_args(args.provider_args)
-        model_provider = ModelFactory.get_provider(args.model_provider, **provider_args)
-        data_loader.generate_responses(model_provider, attempts=args.attempts, max_workers = args.max_workers_response_gen)
+            provider_args = parse_provider_args(args.provider_args)
+            model_provider = ModelFactory.get_provider(args.model_provider, **provider_args)
+            if args.async_mode:
+                gen_engine = AsyncEngine(rpm=args.gen_rpm, tpm=args.gen_tpm, max_concurrency=args.max_concurrency)
+                asyncio.run(data_loader.agenerate_responses(model_provider, gen_engine, attempts=args.attempts))
+            elif not args.pipeline:
+                data_loader.generate_responses(model_provider, attempts=args.attempts, max_workers = args.max_workers_response_gen)
     
-    responses = data_loader.get_responses()
-    conversations = data_loader.get_conversations()
+        responses = data_loader.get_responses()
+        conversations = data_loader.get_conversations()
 
-    evaluator = Evaluator(conversations, responses)
-    evaluation_results = evaluator.evaluate(max_workers=args.max_workers_eval)
+        evaluation_model = None
+        if args.judge_provider:
+            from src.judge_response import JudgeResponse
+            evaluation_model = ModelFactory.get_provider(args.judge_provider, response_format=JudgeResponse,
+                                                         **parse_provider_args(args.judge_args))
+        evaluator = Evaluator(conversations, responses, cache=cache, journal=journal, evaluation_model=evaluation_model)
+        evaluator.recorder = recorder
+        if baseline is not None:
+            for key, record in baseline.verdicts(conversations).items():
+                evaluator.completed.setdefault(key, record)
+        if args.pipeline:
+            result_parser = ResultParser()
+            pipeline = Pipeline(data_loader, evaluator, result_parser, queue_size=args.queue_size)
+            pipeline.run(model_provider, attempts=args.attempts,
+                         gen_workers=args.max_workers_response_gen, eval_workers=args.max_workers_eval,
+                         early_exit=args.early_exit)
+        else:
+            if args.judge_batch:
+                transport = OpenAIBatchTransport(evaluator.evaluation_model.client)
+                evaluation_results = evaluator.evaluate_batch(transport, args.judge_batch, poll_interval=args.batch_poll_interval)
+            elif args.async_mode:
+                eval_engine = AsyncEngine(rpm=args.eval_rpm, tpm=args.eval_tpm, max_concurrency=args.max_concurrency)
+                evaluation_results = asyncio.run(evaluator.aevaluate(eval_engine, early_exit=args.early_exit))
+            else:
+                evaluation_results = evaluator.evaluate(max_workers=args.max_workers_eval, early_exit=args.early_exit)
+            result_parser = ResultParser(evaluation_results)
+        if cache is not None:
+            print(f"Judge cache: {cache.hits} hits, {cache.misses} misses")
+            cache.close()
+        if journal is not None:
+            journal.close()
+        if baseline is not None:
+            judged = len(result_parser.evaluation_results) - sum(evaluator.reused.values())
+            print(f"Baseline: {evaluator.reused['baseline']} verdicts reused, "
+                  f"{evaluator.reused['journal']} resumed from the run journal, {judged} results judged")
 
-    parser = ResultParser(evaluation_results)
-    scores = parser.calculate_scores()
+    if sharded is not None and args.shard_index is not None:
+        sharded.write_shard(args.shard_index, conversations, responses, result_parser.evaluation_results)
+        if recorder is not None:
+            write_metrics(args, recorder)
+        print(f"Shard {args.shard_index} of {args.num_shards} saved to {sharded.shard_dir(args.shard_index)}")
+        return
+
+    scores = result_parser.calculate_scores(k_values=args.pass_at_k)
 
     output_dir = os.path.dirname(args.output_file)
     if output_dir and not os.path.exists(output_dir):
@@ -81,19 +340,49 @@ def main():
         f.write("\nAxis Scores:\n")
         for axis, score in scores['axis_scores'].items():
             f.write(f"{axis}: {score:.2f}%\n")
+        for k, pass_at_k in scores.get('pass_at_k', {}).items():
+            f.write(f"\npass@{k} Overall Score: {pass_at_k['overall_score']:.2f}%\n")
+            for axis, score in pass_at_k['axis_scores'].items():
+                f.write(f"{axis}: {score:.2f}%\n")
+        if baseline is not None:
+            delta = baseline.delta(scores)
+            f.write(f"\nChange from baseline {args.baseline}:\n")
+            f.write(f"Overall Score: {format_change(*delta['overall_score'])}\n")
+            for axis, (before, after) in delta['axis_scores'].items():
+                f.write(f"{axis}: {format_change(before, after)}\n")
 
     # Save detailed raw output if requested
     if args.raw:
-        parser.save_raw_output(
+        result_parser.save_raw_output(
             output_file=args.raw,
             conversations=conversations,
             responses=responses,
             attempts=args.attempts
         )
 
+    if recorder is not None:
+        write_metrics(args, recorder)
+
+    if args.results_store:
+        store.write_run(
+            run_id,
+            conversations=conversations,
+            responses=responses,
+            results=result_parser.evaluation_results,
+            metadata={
+                'responses_file': args.responses_file,
+                'model_provider': args.model_provider,
+                'provider_args': args.provider_args,
+                'attempts': args.attempts
+            },
+            overwrite=args.overwrite_run
+        )
+
     print(f"Evaluation complete. Results saved to {args.output_file}")
     if args.raw:
         print(f"Detailed raw output saved to {args.raw}")
+    if args.results_store:
+        print(f"Run {run_id} added to results store {args.results_store}")
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
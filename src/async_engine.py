@@ -0,0 +1,175 @@
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, List, Dict, Optional
+from src.instrumentation import report_queue_wait
+
+# HTTP status codes worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+# Completion tokens charged per sample before a call; providers count completions against the TPM limit too
+EXPECTED_COMPLETION_TOKENS = 512
+
+
+def estimate_tokens(messages: Any, samples: int = 1, completion_tokens: int = EXPECTED_COMPLETION_TOKENS) -> int:
+    """Rough token estimate (~4 characters per token) of a call's prompt plus `samples` completions, used to charge the tokens-per-minute bucket."""
+    if isinstance(messages, str):
+        prompt_tokens = len(messages) // 4
+    else:
+        prompt_tokens = sum(len(str(m.get('content', ''))) for m in messages) // 4
+    return max(1, prompt_tokens + samples * completion_tokens)
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an error from a provider call is transient (rate limit, server error or connection drop)."""
+    status = getattr(error, 'status_code', None)
+    if status is not None:
+        return status in RETRYABLE_STATUS
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    return type(error).__name__ in ('APIConnectionError', 'APITimeoutError')
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at `capacity` units per minute."""
+
+    def __init__(self, capacity: float):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0):
+        """Wait until `amount` units are available and consume them."""
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class AdaptiveConcurrency:
+    """AIMD concurrency limit with slow start.
+
+    Until the first rate limit the limit grows by one per success (doubling per round trip); after that
+    it grows by one per window of successes. Every rate limit halves it.
+    """
+
+    def __init__(self, max_concurrency: int, initial: Optional[int] = None, min_concurrency: int = 1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = initial or max(min_concurrency, min(max_concurrency, 16))
+        self.in_flight = 0
+        self._successes = 0
+        self._slow_start = True
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self.in_flight -= 1
+            # Wake one waiter per freed slot; waking every waiter is quadratic with thousands queued
+            self._condition.notify(1)
+        return False
+
+    async def on_success(self):
+        async with self._condition:
+            self._successes += 1
+            if (self._slow_start or self._successes >= self.limit) and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                self._condition.notify(1)
+
+    async def on_throttle(self):
+        async with self._condition:
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            self._successes = 0
+            self._slow_start = False
+
+
+class AsyncEngine:
+    """Runs provider calls under a requests/tokens-per-minute limit with adaptive concurrency and retries."""
+
+    def __init__(self, rpm: Optional[int] = None, tpm: Optional[int] = None, max_concurrency: int = 256,
+                 initial_concurrency: Optional[int] = None, max_retries: int = 6,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.initial_concurrency = initial_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retries = 0
+        # asyncio primitives bind to the running loop, so they are created lazily inside it
+        self._request_bucket = None
+        self._token_bucket = None
+        self._concurrency = None
+
+    def _ensure_started(self):
+        if self._concurrency is None:
+            self._request_bucket = TokenBucket(self.rpm) if self.rpm else None
+            self._token_bucket = TokenBucket(self.tpm) if self.tpm else None
+            self._concurrency = AdaptiveConcurrency(self.max_concurrency, self.initial_concurrency)
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def run(self, call: Callable[[], Awaitable[Any]], tokens: int = 1) -> Any:
+        """Await `call()` once rate limits and concurrency allow, retrying transient failures."""
+        self._ensure_started()
+        attempt = 0
+        while True:
+            queued = time.perf_counter()
+            if self._request_bucket is not None:
+                await self._request_bucket.acquire(1)
+            if self._token_bucket is not None:
+                await self._token_bucket.acquire(tokens)
+            try:
+                async with self._concurrency:
+                    # Time spent on rate limits and for a concurrency slot is queueing, not call latency
+                    report_queue_wait(time.perf_counter() - queued)
+                    result = await call()
+            except Exception as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                if getattr(e, 'status_code', None) == 429:
+                    await self._concurrency.on_throttle()
+                self.retries += 1
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+                continue
+            await self._concurrency.on_success()
+            return result
+
+    async def map(self, calls: List[Dict[str, Any]], on_done: Callable[[Any, Any, Optional[Exception]], None] = None):
+        """Run many calls concurrently; each item is {'call': coroutine factory, 'tokens': int, 'key': Any}."""
+
+        async def run_one(item):
+            try:
+                result = await self.run(item['call'], item.get('tokens', 1))
+                error = None
+            except Exception as e:
+                result, error = None, e
+            if on_done is not None:
+                on_done(item.get('key'), result, error)
+            return result, error
+
+        return await asyncio.gather(*(run_one(item) for item in calls))
@@ -0,0 +1,103 @@
+import csv
+import hashlib
+from typing import Any, Dict, List, Tuple
+from src.journal import RunJournal, VerdictTable
+from src.records import TextMap, TextStore
+from src.result_parser import ResultParser, render_conversation
+
+# Raw output cells hold whole conversations and responses, well past the csv module's default field limit
+csv.field_size_limit(2 ** 31 - 1)
+
+
+def fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class Baseline:
+    """A previous run's --raw CSV, used to skip generating and judging (question, attempt) pairs whose inputs are unchanged.
+
+    A response is reused when the conversation it answered is unchanged. A verdict is reused when the judge
+    would see the same TARGET_QUESTION and response; `passed` is recomputed against the current PASS_CRITERIA.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows: Dict[Tuple[Any, int], Dict] = {}
+        # Response and reasoning text is kept as TextStore references
+        self.texts = TextStore()
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                attempt = int(row['attempt_number']) - 1
+                self.rows[(row['question_id'], attempt)] = {
+                    'axis': row['axis'],
+                    'conversation': fingerprint(row['original_conversation']),
+                    'target_question': fingerprint(row['target_question']),
+                    'response': self.texts.put(row['model_response']),
+                    'verdict': row['judge_verdict'],
+                    'passed': row['passed'] == 'PASSED',
+                    'reasoning': self.texts.put(row['reasoning'])
+                }
+
+    def _rows_for(self, conversations: List[Any]):
+        for convo in conversations:
+            attempt = 0
+            # The CSV stores question IDs as text
+            while (str(convo.question_id), attempt) in self.rows:
+                yield convo, attempt, self.rows[(str(convo.question_id), attempt)]
+                attempt += 1
+
+    def responses(self, conversations: List[Any]) -> Dict[Any, TextMap]:
+        """{question_id: {attempt: response}} for baseline responses to conversations that have not changed."""
+        responses = {}
+        for convo, attempt, row in self._rows_for(conversations):
+            if row['conversation'] != fingerprint(render_conversation(convo.conversation)):
+                continue
+            # Failed generations are retried rather than reused
+            response = self.texts.get(row['response'])
+            if response == 'N/A' or response.startswith('Error generating response'):
+                continue
+            responses.setdefault(convo.question_id, TextMap(self.texts))[attempt] = response
+        return responses
+
+    def verdicts(self, conversations: List[Any]) -> Dict[Tuple[Any, int], Dict]:
+        """{(question_id, attempt): result} for baseline verdicts whose judge inputs have not changed.
+
+        Results are tagged with the digest of the response they judged, in the form RunJournal.load_verdicts
+        returns, so the evaluator reuses one only if it is asked to judge the same response, and with
+        `source: baseline` so it counts them apart from journal reuses.
+        """
+        verdicts = VerdictTable(source='baseline')
+        for convo, attempt, row in self._rows_for(conversations):
+            reasoning = self.texts.get(row['reasoning'])
+            if row['verdict'] not in ('YES', 'NO') or reasoning.startswith('Error during evaluation'):
+                continue
+            if row['target_question'] != fingerprint(convo.target_question):
+                continue
+            verdicts.append({
+                'question_id': convo.question_id,
+                'axis': convo.axis,
+                'attempt': attempt,
+                'reasoning': reasoning,
+                'verdict': row['verdict'],
+                'pass_criteria': convo.pass_criteria,
+                'passed': row['verdict'] == convo.pass_criteria,
+                'response_digest': RunJournal.response_digest(self.texts.get(row['response']))
+            })
+        return verdicts.by_attempt()
+
+    def scores(self) -> Dict:
+        """The baseline run's scores, recomputed from its per-attempt rows."""
+        results = [
+            {'question_id': question_id, 'axis': row['axis'], 'attempt': attempt, 'passed': row['passed']}
+            for (question_id, attempt), row in self.rows.items() if row['verdict'] != 'N/A'
+        ]
+        return ResultParser(results).calculate_scores()
+
+    def delta(self, scores: Dict) -> Dict:
+        """Overall and per-axis (baseline, current) score pairs for every axis in either run."""
+        before = self.scores()
+        axes = sorted(set(before['axis_scores']) | set(scores['axis_scores']))
+        return {
+            'overall_score': (before['overall_score'], scores['overall_score']),
+            'axis_scores': {axis: (before['axis_scores'].get(axis), scores['axis_scores'].get(axis)) for axis in axes}
+        }
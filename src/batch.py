@@ -0,0 +1,102 @@
+import json
+import os
+import shutil
+import uuid
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Iterator, Optional
+
+
+class BatchTransport(ABC):
+    """Submits a JSONL file of chat completion requests as one offline batch and retrieves the results."""
+
+    @abstractmethod
+    def submit(self, requests_path: str) -> str:
+        """Submit the requests file and return a batch id."""
+        pass
+
+    @abstractmethod
+    def status(self, batch_id: str) -> str:
+        """Return the batch status: 'completed', 'failed', 'expired', 'cancelled' or an in-progress state."""
+        pass
+
+    @abstractmethod
+    def results(self, batch_id: str) -> Iterator[Dict]:
+        """Yield one output record per request: {'custom_id', 'response': {'status_code', 'body'}, 'error'}."""
+        pass
+
+
+class OpenAIBatchTransport(BatchTransport):
+    """Transport backed by the OpenAI Batch API."""
+
+    def __init__(self, client: Any, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+        self._output_file_ids = {}
+
+    def submit(self, requests_path: str) -> str:
+        with open(requests_path, 'rb') as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window=self.completion_window
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        batch = self.client.batches.retrieve(batch_id)
+        self._output_file_ids[batch_id] = (batch.output_file_id, batch.error_file_id)
+        return batch.status
+
+    def results(self, batch_id: str) -> Iterator[Dict]:
+        for file_id in self._output_file_ids.get(batch_id, (None, None)):
+            if file_id:
+                for line in self.client.files.content(file_id).text.splitlines():
+                    if line.strip():
+                        yield json.loads(line)
+
+
+class LocalBatchTransport(BatchTransport):
+    """File-based stand-in for a batch endpoint.
+
+    Each submitted batch gets a directory holding `input.jsonl`; the batch is complete once
+    `output.jsonl` appears there. If a `responder` is given it is called with each request body
+    and its return value is written as the response body, completing the batch immediately.
+    """
+
+    def __init__(self, directory: str, responder: Optional[Callable[[Dict], Dict]] = None):
+        self.directory = directory
+        self.responder = responder
+        os.makedirs(directory, exist_ok=True)
+
+    def _batch_dir(self, batch_id: str) -> str:
+        return os.path.join(self.directory, batch_id)
+
+    def submit(self, requests_path: str) -> str:
+        batch_id = f"batch_{uuid.uuid4().hex}"
+        batch_dir = self._batch_dir(batch_id)
+        os.makedirs(batch_dir)
+        shutil.copyfile(requests_path, os.path.join(batch_dir, 'input.jsonl'))
+        if self.responder is not None:
+            with open(os.path.join(batch_dir, 'input.jsonl'), 'r', encoding='utf-8') as src, \
+                 open(os.path.join(batch_dir, 'output.jsonl'), 'w', encoding='utf-8') as dst:
+                for line in src:
+                    request = json.loads(line)
+                    record = {'custom_id': request['custom_id'], 'response': None, 'error': None}
+                    try:
+                        record['response'] = {'status_code': 200, 'body': self.responder(request['body'])}
+                    except Exception as e:
+                        record['error'] = {'message': str(e)}
+                    dst.write(json.dumps(record) + '\n')
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        if os.path.exists(os.path.join(self._batch_dir(batch_id), 'output.jsonl')):
+            return 'completed'
+        return 'in_progress'
+
+    def results(self, batch_id: str) -> Iterator[Dict]:
+        with open(os.path.join(self._batch_dir(batch_id), 'output.jsonl'), 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
@@ -0,0 +1,99 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Optional, Tuple
+
+
+class VerdictCache:
+    """Persistent, content-addressed cache of judge verdicts backed by SQLite.
+
+    A failing read or write (e.g. "database is locked" while another process holds the file) is logged and
+    treated as a miss, so it never costs the verdict the judge was paid for.
+    """
+
+    def __init__(self, path: str, max_entries: int = 100000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            "key TEXT PRIMARY KEY, reasoning TEXT NOT NULL, verdict TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS verdicts_last_used ON verdicts(last_used)")
+        self._conn.commit()
+        # Kept as a running count so inserts need not scan the table; recounted when evicting
+        self._count = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+        # Past the cap, evict down to 90% of it so eviction runs once per tenth of the cap, not on every insert
+        self._evict_to = max_entries - max_entries // 10
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(model: str, prompt_template: str, response: str, criteria: str) -> str:
+        """Hash everything that can change the judge's verdict into a cache key."""
+        digest = hashlib.sha256()
+        for part in (model, prompt_template, response, criteria):
+            encoded = str(part).encode('utf-8')
+            digest.update(len(encoded).to_bytes(8, 'big'))
+            digest.update(encoded)
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, str]]:
+        """Return the cached (reasoning, verdict) for a key, or None on a miss."""
+        with self._lock:
+            try:
+                row = self._conn.execute("SELECT reasoning, verdict FROM verdicts WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (time.time(), key))
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error reading verdict cache {self.path}: {str(e)}. Judging without it.")
+                self._rollback()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return row[0], row[1]
+
+    def put(self, key: str, reasoning: str, verdict: str):
+        """Store a verdict, evicting the least recently used entries past the size cap."""
+        with self._lock:
+            try:
+                updated = self._conn.execute(
+                    "UPDATE verdicts SET reasoning = ?, verdict = ?, last_used = ? WHERE key = ?",
+                    (reasoning, verdict, time.time(), key)
+                ).rowcount
+                if not updated:
+                    self._conn.execute(
+                        "INSERT INTO verdicts (key, reasoning, verdict, last_used) VALUES (?, ?, ?, ?)",
+                        (key, reasoning, verdict, time.time())
+                    )
+                    self._count += 1
+                if self._count > self.max_entries:
+                    # Other processes sharing the file also insert, so evict from a fresh count
+                    self._count = self._conn.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+                    if self._count > self.max_entries:
+                        self._conn.execute(
+                            "DELETE FROM verdicts WHERE key IN (SELECT key FROM verdicts ORDER BY last_used ASC LIMIT ?)",
+                            (self._count - self._evict_to,)
+                        )
+                        self._count = self._evict_to
+                self._conn.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing verdict cache {self.path}: {str(e)}. Verdict kept but not cached.")
+                self._rollback()
+
+    def _rollback(self):
+        try:
+            self._conn.rollback()
+        except sqlite3.Error:
+            pass
+        # A rolled-back insert or eviction leaves the running count unknown
+        self._count = self.max_entries + 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
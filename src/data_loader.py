@@ -1,70 +1,267 @@
-import json
-from typing import List, Dict
+import asyncio
+import time
+from typing import Any, List, Dict
 from src.conversation import Conversation
+from src.jsonl import iter_jsonl, RecordError
 from src.models.base import ModelProvider
+from src.async_engine import AsyncEngine, estimate_tokens
+from src.journal import RunJournal
+from src.instrumentation import Recorder, span_or_null
+from src.records import ResponseStore
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+# Fields every benchmark question record must provide
+CONVERSATION_FIELDS = ['QUESTION_ID', 'AXIS', 'CONVERSATION', 'TARGET_QUESTION', 'PASS_CRITERIA']
+
 class DataLoader:
     def __init__(self, input_file: str, response_file: str = None):
         self.input_file = input_file
         self.response_file = response_file
         self.conversations: List[Conversation] = []
-        self.responses: Dict[int, List[str]] = {}  # Modified to store list of responses
-
-    def load_data(self):
-        """Loads input data and creates Conversation objects."""
-        with open(self.input_file, 'r') as f:
-            for line in f:
-                data = json.loads(line)
-                conversation = Conversation(
-                    question_id=data['QUESTION_ID'],
-                    axis=data['AXIS'],
-                    conversation=data['CONVERSATION'],
-                    target_question=data['TARGET_QUESTION'],
-                    pass_criteria=data['PASS_CRITERIA']
-                )
-                self.conversations.append(conversation)
-
-    def load_responses(self, response_file):
-        """Loads model responses from the provided file."""
+        self.responses: Dict[int, List[str]] = ResponseStore()  # Modified to store list of responses
+        self.journal: RunJournal = None
+        self.completed: Dict[int, Dict[int, str]] = {}  # Responses already journaled, by question_id then attempt
+        self.recorder: Recorder = None
+
+    def load_data(self, use_mmap: bool = False):
+        """Loads input data and creates Conversation objects, validating each record."""
+        seen = set()
+        for path, line_number, data in iter_jsonl(self.input_file, use_mmap=use_mmap):
+            conversation = self._parse_conversation(path, line_number, data)
+            if conversation.question_id in seen:
+                raise RecordError(path, line_number, f"duplicate QUESTION_ID {conversation.question_id}")
+            seen.add(conversation.question_id)
+            self.conversations.append(conversation)
+
+    @staticmethod
+    def _parse_conversation(path: str, line_number: int, data: Any) -> Conversation:
+        if not isinstance(data, dict):
+            raise RecordError(path, line_number, "record must be a JSON object")
+        missing = [field for field in CONVERSATION_FIELDS if field not in data]
+        if missing:
+            raise RecordError(path, line_number, f"missing field(s) {', '.join(missing)}")
+        for field in ('AXIS', 'TARGET_QUESTION', 'PASS_CRITERIA'):
+            if not isinstance(data[field], str):
+                raise RecordError(path, line_number, f"{field} must be a string")
+        messages = data['CONVERSATION']
+        if not isinstance(messages, list) or not all(
+                isinstance(m, dict) and isinstance(m.get('role'), str) and isinstance(m.get('content'), str) for m in messages):
+            raise RecordError(path, line_number, "CONVERSATION must be a list of {'role', 'content'} messages")
+        return Conversation(
+            question_id=data['QUESTION_ID'],
+            axis=data['AXIS'],
+            conversation=messages,
+            target_question=data['TARGET_QUESTION'],
+            pass_criteria=data['PASS_CRITERIA']
+        )
+
+    def load_responses(self, response_file, use_mmap: bool = False):
+        """Loads model responses from a file, glob or list of shards (optionally .gz/.zst compressed).
+
+        Attempts for the same QUESTION_ID in different shards are concatenated in shard order.
+        """
         if response_file:
-            with open(response_file, 'r') as f:
-                self.responses = {
-                    item['QUESTION_ID']: item['RESPONSE']  # Note: 'RESPONSE', not 'RESPONSES'
-                    for item in (json.loads(line) for line in f)
-                }
+            responses = ResponseStore()
+            seen = set()
+            for path, line_number, item in iter_jsonl(response_file, use_mmap=use_mmap):
+                if not isinstance(item, dict) or 'QUESTION_ID' not in item or 'RESPONSE' not in item:  # Note: 'RESPONSE', not 'RESPONSES'
+                    raise RecordError(path, line_number, "record must have QUESTION_ID and RESPONSE fields")
+                attempts = item['RESPONSE']
+                if isinstance(attempts, str):
+                    attempts = [attempts]
+                if not isinstance(attempts, list) or not all(isinstance(r, str) for r in attempts):
+                    raise RecordError(path, line_number, "RESPONSE must be a string or a list of strings")
+                if (path, item['QUESTION_ID']) in seen:
+                    raise RecordError(path, line_number, f"duplicate QUESTION_ID {item['QUESTION_ID']}")
+                seen.add((path, item['QUESTION_ID']))
+                responses.setdefault(item['QUESTION_ID'], []).extend(attempts)
+            self.responses = responses
         return self.responses
 
+    def use_journal(self, journal: RunJournal):
+        """Journal every generated response and skip attempts the journal already holds."""
+        self.journal = journal
+        self.completed = journal.load_responses()
+
+    def _completed_attempt(self, conversation: Conversation, attempt: int):
+        return self.completed.get(conversation.question_id, {}).get(attempt)
+
+    def _record_attempt(self, conversation: Conversation, attempt: int, response: str):
+        if self.journal is not None:
+            self.journal.record_response(conversation.question_id, attempt, response)
+
+    def _record_attempts(self, conversation: Conversation, attempts: List[int], responses: List[str]):
+        for attempt, response in zip(attempts, responses):
+            self._record_attempt(conversation, attempt, response)
+
+    def generate_attempt(self, model_provider: ModelProvider, conversation: Conversation, attempt: int = 0,
+                         queued_at: float = None) -> str:
+        """Generate one response, saving any exception as the response so the judge fails it.
+
+        `queued_at` is a time.perf_counter() taken when the call was handed to a worker, timed as queue wait.
+        """
+        completed = self._completed_attempt(conversation, attempt)
+        if completed is not None:
+            return completed
+        try:
+            with span_or_null(self.recorder, 'generate', conversation.question_id, attempt, axis=conversation.axis,
+                              queued_at=queued_at):
+                response = model_provider.generate(conversation.conversation)
+        except Exception as e:
+            print(f"Error generating response for question_id {conversation.question_id}: {str(e)}. Exception saved as response.")
+            # Failures are not journaled so a resumed run retries them
+            return f"Error generating response for question_id {conversation.question_id}: {str(e)}.\n FAIL THIS QUESTION"
+        self._record_attempt(conversation, attempt, response)
+        return response
+
+    def generate_attempts(self, model_provider: ModelProvider, conversation: Conversation, attempts: int,
+                          queued_at: float = None) -> List[str]:
+        """Generate all missing attempts for a conversation, sending the history once when the provider supports n samples."""
+        responses = [self._completed_attempt(conversation, attempt) for attempt in range(attempts)]
+        missing = [attempt for attempt, response in enumerate(responses) if response is None]
+        if not missing:
+            return responses
+        if not model_provider.supports_n or len(missing) == 1:
+            for attempt in missing:
+                responses[attempt] = self.generate_attempt(model_provider, conversation, attempt, queued_at)
+                # Later attempts start as soon as the previous one finishes, without waiting for a worker
+                queued_at = None
+            return responses
+        try:
+            with span_or_null(self.recorder, 'generate', conversation.question_id, missing[0],
+                              axis=conversation.axis, queued_at=queued_at, samples=len(missing)):
+                samples = model_provider.generate_n(conversation.conversation, len(missing))
+        except Exception as e:
+            print(f"Error generating response for question_id {conversation.question_id}: {str(e)}. Exception saved as response.")
+            error = f"Error generating response for question_id {conversation.question_id}: {str(e)}.\n FAIL THIS QUESTION"
+            for attempt in missing:
+                responses[attempt] = error
+            return responses
+        for attempt, sample in zip(missing, samples):
+            responses[attempt] = sample
+            self._record_attempt(conversation, attempt, sample)
+        return responses
+
     def generate_responses(self, model_provider: ModelProvider, attempts: int = 1, max_workers: int = 1) -> Dict[int, List[str]]:
         """Generate k responses for each conversation using the provided model provider in parallel."""
+        if model_provider.supports_batching:
+            return self.generate_responses_batched(model_provider, attempts=attempts)
 
-        def generate_conversation_responses(conversation):
-            responses = []
-            for _ in range(attempts):
-                try:
-                    response = model_provider.generate(conversation.conversation)
-                    responses.append(response)
-                except Exception as e:
-                    print(f"Error generating response for question_id {conversation.question_id}: {str(e)}. Exception saved as response.")
-                    responses.append(f"Error generating response for question_id {conversation.question_id}: {str(e)}.\n FAIL THIS QUESTION")
-            return conversation.question_id, responses
+        def generate_conversation_responses(conversation, queued_at):
+            # Stored by the worker, so finished futures do not keep the response text alive
+            self.responses[conversation.question_id] = self.generate_attempts(model_provider, conversation, attempts, queued_at)
 
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             futures = [
-                executor.submit(generate_conversation_responses, conversation)
+                executor.submit(generate_conversation_responses, conversation, time.perf_counter())
                 for conversation in self.conversations
             ]
 
             for future in tqdm(as_completed(futures), total=len(futures), desc="Generating responses"):
                 try:
-                    question_id, responses = future.result()
-                    self.responses[question_id] = responses
+                    future.result()
                 except Exception as e:
                     print(f"Error processing future: {str(e)}")
 
         return self.responses
 
+    def generate_responses_batched(self, model_provider: ModelProvider, attempts: int = 1) -> Dict[int, List[str]]:
+        """Generate k responses per conversation in length-sorted batches, one provider call per batch."""
+        # Filled in place as batches finish, so the text goes straight into the response store
+        for c in self.conversations:
+            self.responses[c.question_id] = [self._completed_attempt(c, a) for a in range(attempts)]
+        responses = self.responses
+
+        # Group conversations by how many attempts are still missing so each batch asks for the same number of samples
+        pending = {}
+        for conversation in self.conversations:
+            missing = [a for a, r in enumerate(responses[conversation.question_id]) if r is None]
+            if missing:
+                pending.setdefault(len(missing), []).append((conversation, missing))
+
+        batches = []
+        for group in pending.values():
+            # Similar lengths per batch keep padding waste low
+            group.sort(key=lambda item: sum(len(m['content']) for m in item[0].conversation))
+            for start in range(0, len(group), model_provider.batch_size):
+                batches.append(group[start:start + model_provider.batch_size])
+
+        for batch in tqdm(batches, desc="Generating responses"):
+            chats = [conversation.conversation for conversation, _ in batch]
+            try:
+                with span_or_null(self.recorder, 'generate', [c.question_id for c, _ in batch], batch[0][1][0],
+                                  axis=[c.axis for c, _ in batch], samples=len(batch) * len(batch[0][1])):
+                    outputs = model_provider.generate_batch(chats, num_return_sequences=len(batch[0][1]))
+                failed = False
+            except Exception as e:
+                print(f"Error generating batch of {len(batch)} conversations: {str(e)}. Exception saved as response.")
+                outputs = [[f"Error generating response for question_id {conversation.question_id}: {str(e)}.\n FAIL THIS QUESTION"] * len(missing)
+                           for conversation, missing in batch]
+                failed = True
+            for (conversation, missing), samples in zip(batch, outputs):
+                for attempt, sample in zip(missing, samples):
+                    responses[conversation.question_id][attempt] = sample
+                    if not failed:
+                        self._record_attempt(conversation, attempt, sample)
+
+        return self.responses
+
+    async def agenerate_responses(self, model_provider: ModelProvider, engine: AsyncEngine, attempts: int = 1) -> Dict[int, List[str]]:
+        """Generate k responses for each conversation concurrently on one event loop via `model_provider.agenerate`."""
+        progress = tqdm(total=len(self.conversations) * attempts, desc="Generating responses")
+
+        async def generate_attempt(conversation, attempt):
+            response = self._completed_attempt(conversation, attempt)
+            if response is None:
+                try:
+                    with span_or_null(self.recorder, 'generate', conversation.question_id, attempt, axis=conversation.axis):
+                        response = await engine.run(
+                            lambda: model_provider.agenerate(conversation.conversation),
+                            tokens=estimate_tokens(conversation.conversation)
+                        )
+                    # The journal fsyncs each record, so write it from a worker thread rather than the event loop
+                    await asyncio.to_thread(self._record_attempt, conversation, attempt, response)
+                except Exception as e:
+                    print(f"Error generating response for question_id {conversation.question_id}: {str(e)}. Exception saved as response.")
+                    response = f"Error generating response for question_id {conversation.question_id}: {str(e)}.\n FAIL THIS QUESTION"
+            progress.update(1)
+            return response
+
+        async def generate_n(conversation):
+            responses = [self._completed_attempt(conversation, attempt) for attempt in range(attempts)]
+            missing = [attempt for attempt, response in enumerate(responses) if response is None]
+            try:
+                with span_or_null(self.recorder, 'generate', conversation.question_id, missing[0],
+                                  axis=conversation.axis, samples=len(missing)):
+                    samples = await engine.run(
+                        lambda: model_provider.agenerate_n(conversation.conversation, len(missing)),
+                        tokens=estimate_tokens(conversation.conversation, samples=len(missing))
+                    )
+                await asyncio.to_thread(self._record_attempts, conversation, missing, samples)
+            except Exception as e:
+                print(f"Error generating response for question_id {conversation.question_id}: {str(e)}. Exception saved as response.")
+                samples = [f"Error generating response for question_id {conversation.question_id}: {str(e)}.\n FAIL THIS QUESTION"] * len(missing)
+            for attempt, sample in zip(missing, samples):
+                responses[attempt] = sample
+            progress.update(attempts)
+            return responses
+
+        async def generate_conversation_responses(conversation):
+            pending = sum(self._completed_attempt(conversation, attempt) is None for attempt in range(attempts))
+            if model_provider.supports_n and pending > 1:
+                # One request carries the conversation history for all of its missing attempts
+                responses = await generate_n(conversation)
+            else:
+                responses = await asyncio.gather(*(generate_attempt(conversation, attempt) for attempt in range(attempts)))
+            # Stored as soon as they are done rather than held until every conversation finishes
+            self.responses[conversation.question_id] = list(responses)
+
+        await asyncio.gather(*(generate_conversation_responses(c) for c in self.conversations))
+        progress.close()
+
+        return self.responses
+
     def get_conversations(self) -> List[Conversation]:
         """Returns the list of Conversation objects."""
         return self.conversations
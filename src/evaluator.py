@@ -1,13 +1,20 @@
-from pydantic import BaseModel
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Dict, Tuple, Any, Literal
-from src.models.openai import OpenAIModel
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Iterator, List, Dict, Tuple, Any
+from src.cache import VerdictCache
+from src.async_engine import AsyncEngine, estimate_tokens
+from src.journal import RunJournal
+from src.batch import BatchTransport
+from src.result_parser import ScoreAggregator
+from src.records import ResultTable
+from src.instrumentation import Recorder, span_or_null, mark_cached
 from tqdm import tqdm
 
-class JudgeResponse(BaseModel):
-    reasoning: str
-    verdict: Literal["YES", "NO"]
-
 JUDGE_PROMPT = '''You are tasked with evaluating a model response to see if it meets a specific criteria.
 The criteria will always be YES/NO evaluation.
 
@@ -23,87 +30,407 @@ The criteria that the model response must meet is as follows. Be VERY STRICT!:
 
 Print your reasoning followed by your verdict, either "YES" or "NO".'''
 
+JUDGE_MODEL = "gpt-4o-2024-08-06"
+
+def __getattr__(name: str):
+    # JudgeResponse lives in its own module so that importing the evaluator does not import pydantic
+    if name == 'JudgeResponse':
+        from src.judge_response import JudgeResponse
+        return JudgeResponse
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 class Evaluator:
-    def __init__(self, conversations: List[Any], responses: Dict[int, List[str]]):
+    def __init__(self, conversations: List[Any], responses: Dict[int, List[str]], cache: VerdictCache = None,
+                 journal: RunJournal = None, evaluation_model: Any = None):
         self.conversations = conversations
         self.responses = responses
-        self.evaluation_model = OpenAIModel(
-            model="gpt-4o-2024-08-06", 
-            temp=0, 
-            # max_tokens=4096,
-            response_format=JudgeResponse
-        )
-        self.results = []
-
-    def evaluate_helper(self, i: int, conversation: Any, response: str) -> Tuple[int, str, str, str, str]:
+        self.cache = cache
+        self.journal = journal
+        self.completed = journal.load_verdicts() if journal is not None else {}
+        # Results taken from self.completed instead of judged, by source ('journal', or 'baseline' for --baseline verdicts)
+        self.reused = Counter()
+        self._lock = threading.Lock()
+        self.recorder: Recorder = None
+        # A judge may be passed in to share one client across several evaluators
+        if evaluation_model is None:
+            from src.models.openai import OpenAIModel
+            from src.judge_response import JudgeResponse
+            evaluation_model = OpenAIModel(
+                model=JUDGE_MODEL, 
+                temp=0, 
+                # max_tokens=4096,
+                response_format=JudgeResponse
+            )
+        self.evaluation_model = evaluation_model
+        self.results = ResultTable()
+
+    def evaluate_helper(self, i: int, conversation: Any, response: str, attempt: int = None,
+                        queued_at: float = None) -> Tuple[int, str, str, str, str]:
         """Evaluate a single response."""
-        target_question = conversation.target_question
-        pass_criteria = conversation.pass_criteria
-        prompt = JUDGE_PROMPT.format(response, target_question)
-        judgement = self.evaluation_model.generate([{"role": "user", "content": prompt}])
-        return i, conversation.axis, judgement.reasoning, judgement.verdict, pass_criteria
-
-    def evaluate(self, max_workers:int = 1) -> List[Dict]:
-        """Evaluate all responses for each conversation"""
+        with span_or_null(self.recorder, 'judge', conversation.question_id, attempt,
+                          axis=conversation.axis, queued_at=queued_at):
+            target_question = conversation.target_question
+            pass_criteria = conversation.pass_criteria
+            cache_key = None
+            if self.cache is not None:
+                cache_key = VerdictCache.make_key(self.evaluation_model.model, JUDGE_PROMPT, response, target_question)
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    reasoning, verdict = cached
+                    mark_cached()
+                    return i, conversation.axis, reasoning, verdict, pass_criteria
+            prompt = JUDGE_PROMPT.format(response, target_question)
+            judgement = self.evaluation_model.generate([{"role": "user", "content": prompt}])
+            if self.cache is not None:
+                self.cache.put(cache_key, judgement.reasoning, judgement.verdict)
+            return i, conversation.axis, judgement.reasoning, judgement.verdict, pass_criteria
+
+    async def aevaluate_helper(self, i: int, conversation: Any, response: str, engine: AsyncEngine,
+                               attempt: int = None) -> Tuple[int, str, str, str, str]:
+        """Evaluate a single response with the async judge client, routed through the engine's rate limiter."""
+        with span_or_null(self.recorder, 'judge', conversation.question_id, attempt, axis=conversation.axis):
+            target_question = conversation.target_question
+            pass_criteria = conversation.pass_criteria
+            cache_key = None
+            if self.cache is not None:
+                cache_key = VerdictCache.make_key(self.evaluation_model.model, JUDGE_PROMPT, response, target_question)
+                # SQLite reads and commits run on a worker thread, off the event loop
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    reasoning, verdict = cached
+                    mark_cached()
+                    return i, conversation.axis, reasoning, verdict, pass_criteria
+            prompt = [{"role": "user", "content": JUDGE_PROMPT.format(response, target_question)}]
+            judgement = await engine.run(lambda: self.evaluation_model.agenerate(prompt), tokens=estimate_tokens(prompt))
+            if self.cache is not None:
+                await asyncio.to_thread(self.cache.put, cache_key, judgement.reasoning, judgement.verdict)
+            return i, conversation.axis, judgement.reasoning, judgement.verdict, pass_criteria
+
+    def _journaled_result(self, convo: Any, attempt: int, response: str):
+        """Return the journaled result for this attempt if it judged the same response, else None."""
+        record = self.completed.get((convo.question_id, attempt))
+        if record is None or record.get('response_digest') != RunJournal.response_digest(response):
+            return None
+        with self._lock:
+            self.reused[record.get('source', 'journal')] += 1
+        return {k: v for k, v in record.items() if k not in ('response_digest', 'source')}
+
+    def _record(self, result: Dict, response: str):
+        if self.journal is not None:
+            self.journal.record_verdict(result, response)
+
+    def _missing_result(self, convo: Any) -> Dict:
+        return {
+            'question_id': convo.question_id,
+            'axis': convo.axis,
+            'attempt': 0,
+            'reasoning': 'NA - Question ID not found in responses',
+            'verdict': 'NO',
+            'pass_criteria': convo.pass_criteria,
+            'passed': False
+        }
+
+    def _judged_result(self, i: int, attempt: int, axis: str, reasoning: str, verdict: str, pass_criteria: str) -> Dict:
+        return {
+            'question_id': self.conversations[i].question_id,
+            'axis': axis,
+            'attempt': attempt,
+            'reasoning': reasoning,
+            'verdict': verdict,
+            'pass_criteria': pass_criteria,
+            'passed': verdict == pass_criteria
+        }
+
+    def _error_result(self, i: int, error: Exception, attempt: Any = 'NA') -> Dict:
+        return {
+            'question_id': self.conversations[i].question_id if i < len(self.conversations) else 'Unknown',
+            'axis': 'NA',
+            'attempt': attempt,
+            'reasoning': f'Error during evaluation: {str(error)}',
+            'verdict': 'NO',
+            'pass_criteria': 'NA',
+            'passed': False
+        }
+
+    def judge_attempt(self, i: int, attempt: int, response: str, queued_at: float = None) -> Dict:
+        """Judge one attempt of the i-th conversation and return its result record."""
+        journaled = self._journaled_result(self.conversations[i], attempt, response)
+        if journaled is not None:
+            return journaled
+        try:
+            _, axis, reasoning, verdict, pass_criteria = self.evaluate_helper(i, self.conversations[i], response, attempt, queued_at)
+            result = self._judged_result(i, attempt, axis, reasoning, verdict, pass_criteria)
+            self._record(result, response)
+            return result
+        except Exception as e:
+            return self._error_result(i, e, attempt)
+
+    def _slots(self) -> Iterator[Tuple[int, Any]]:
+        """(conversation index, attempt) for every result to produce, with attempt None for a conversation without responses."""
+        for i, convo in enumerate(self.conversations):
+            if convo.question_id not in self.responses:
+                yield i, None
+            else:
+                for j in range(len(self.responses[convo.question_id])):
+                    yield i, j
+
+    def _slot_count(self) -> int:
+        return sum(len(self.responses[c.question_id]) if c.question_id in self.responses else 1 for c in self.conversations)
+
+    def judge_slot(self, i: int, attempt: int, queued_at: float = None) -> Dict:
+        """Judge one attempt, reading its response from the response store only once a worker picks it up."""
+        return self.judge_attempt(i, attempt, self.responses[self.conversations[i].question_id][attempt], queued_at)
+
+    def submit(self, executor: Executor, window: int = 256) -> 'JudgeCalls':
+        """Start submitting the judge calls to `executor`, at most `window` at a time; pass the result to `collect`.
+
+        Each call journals its verdict as soon as it finishes; `collect` takes the results in attempt order.
+        """
+        return JudgeCalls(self, executor, window)
+
+    def collect(self, calls: 'JudgeCalls', desc: str = "Evaluating responses") -> List[Dict]:
+        """Wait for the calls started by `submit`, submitting the rest as earlier ones finish, and finalize the results."""
+        for i, j, future in tqdm(calls, desc=desc, total=len(calls)):
+            try:
+                self.results.append(future.result())
+            except Exception as e:
+                # Handle any other unexpected errors
+                self.results.append(self._error_result(i, e, j))
+
+        return self._finalize_results()
+
+    def evaluate(self, max_workers:int = 1, early_exit: bool = False) -> List[Dict]:
+        """Evaluate all responses for each conversation.
+
+        With `early_exit`, each question's attempts are judged in order and judging stops at the first
+        pass. Pass/fail per question is unchanged, but later attempts get no verdict.
+        """
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            if not early_exit:
+                return self.collect(self.submit(executor, window=4 * max_workers))
             futures = []
             for i, convo in enumerate(self.conversations):
                 if convo.question_id not in self.responses:
-                    # Handle missing question_id
-                    self.results.append({
-                        'question_id': convo.question_id,
-                        'axis': convo.axis,
-                        'attempt': 0,
-                        'reasoning': 'NA - Question ID not found in responses',
-                        'verdict': 'NO',
-                        'pass_criteria': convo.pass_criteria,
-                        'passed': False
-                    })
+                    self.results.append(self._missing_result(convo))
                 else:
-                    for j, response in enumerate(self.responses[convo.question_id]):
-                        futures.append(
-                            executor.submit(self.evaluate_helper, i, convo, response)
-                        )
-
+                    futures.append(executor.submit(self.judge_until_pass, i, time.perf_counter()))
             for future in tqdm(futures, desc="Evaluating responses", total=len(futures)):
-                try:
-                    i, axis, reasoning, verdict, pass_criteria = future.result()
-                    self.results.append({
-                        'question_id': self.conversations[i].question_id,
-                        'axis': axis,
-                        'attempt': j,
-                        'reasoning': reasoning,
-                        'verdict': verdict,
-                        'pass_criteria': pass_criteria,
-                        'passed': verdict == pass_criteria
-                    })
-                except Exception as e:
-                    # Handle any other unexpected errors
-                    self.results.append({
-                        'question_id': self.conversations[i].question_id if i < len(self.conversations) else 'Unknown',
-                        'axis': 'NA',
-                        'attempt': 'NA',
-                        'reasoning': f'Error during evaluation: {str(e)}',
-                        'verdict': 'NO',
-                        'pass_criteria': 'NA',
-                        'passed': False
-                    })
-
-        # Calculate the final pass/fail status for each question
-        question_results = {}
-        for result in self.results:
-            question_id = result['question_id']
-            if question_id not in question_results:
-                question_results[question_id] = {'attempts': 0, 'passes': 0}
-            question_results[question_id]['attempts'] += 1
+                self.results.extend(future.result())
+        return self._finalize_results()
+
+    async def ajudge_attempt(self, i: int, attempt: int, response: str, engine: AsyncEngine) -> Dict:
+        """Async counterpart of `judge_attempt`."""
+        journaled = self._journaled_result(self.conversations[i], attempt, response)
+        if journaled is not None:
+            return journaled
+        try:
+            _, axis, reasoning, verdict, pass_criteria = await self.aevaluate_helper(i, self.conversations[i], response, engine, attempt)
+            result = self._judged_result(i, attempt, axis, reasoning, verdict, pass_criteria)
+            # The journal fsyncs each record, so write it from a worker thread rather than the event loop
+            await asyncio.to_thread(self._record, result, response)
+            return result
+        except Exception as e:
+            return self._error_result(i, e, attempt)
+
+    def judge_until_pass(self, i: int, queued_at: float = None) -> List[Dict]:
+        """Judge the i-th conversation's attempts in order, stopping at the first one that passes."""
+        results = []
+        for j, response in enumerate(self.responses[self.conversations[i].question_id]):
+            result = self.judge_attempt(i, j, response, queued_at if j == 0 else None)
+            results.append(result)
+            if result['passed']:
+                break
+        return results
+
+    async def ajudge_until_pass(self, i: int, engine: AsyncEngine) -> List[Dict]:
+        """Async counterpart of `judge_until_pass`."""
+        results = []
+        for j, response in enumerate(self.responses[self.conversations[i].question_id]):
+            result = await self.ajudge_attempt(i, j, response, engine)
+            results.append(result)
             if result['passed']:
-                question_results[question_id]['passes'] += 1
+                break
+        return results
+
+    async def aevaluate(self, engine: AsyncEngine, early_exit: bool = False, window: int = None) -> List[Dict]:
+        """Evaluate all responses concurrently on one event loop, bounded by the engine's rate limits.
+
+        Calls are started in (conversation, attempt) order with at most `window` (default: twice the engine's
+        concurrency) outstanding, each reading its response from the store when it starts, so memory does not
+        grow with the number of attempts.
+        """
+        window = window or 2 * engine.max_concurrency
+
+        async def judge(i, j):
+            convo = self.conversations[i]
+            if j is None:
+                return [self._missing_result(convo)]
+            if early_exit:
+                return await self.ajudge_until_pass(i, engine)
+            return [await self.ajudge_attempt(i, j, self.responses[convo.question_id][j], engine)]
+
+        if early_exit:
+            pending = ((i, 0 if convo.question_id in self.responses else None) for i, convo in enumerate(self.conversations))
+            total = len(self.conversations)
+        else:
+            pending, total = self._slots(), self._slot_count()
+        progress = tqdm(total=total, desc="Evaluating responses")
+        in_flight = deque()
+        while True:
+            while len(in_flight) < window:
+                slot = next(pending, None)
+                if slot is None:
+                    break
+                in_flight.append(asyncio.ensure_future(judge(*slot)))
+            if not in_flight:
+                break
+            self.results.extend(await in_flight.popleft())
+            progress.update(1)
+        progress.close()
+        return self._finalize_results()
+
+    def batch_request(self, custom_id: str, response: str, conversation: Any) -> Dict:
+        """Build one batch API request line asking the judge for a structured JudgeResponse."""
+        from src.judge_response import JudgeResponse
+        schema = JudgeResponse.model_json_schema()
+        schema['additionalProperties'] = False
+        return {
+            'custom_id': custom_id,
+            'method': 'POST',
+            'url': '/v1/chat/completions',
+            'body': {
+                'model': self.evaluation_model.model,
+                'messages': [{"role": "user", "content": JUDGE_PROMPT.format(response, conversation.target_question)}],
+                'temperature': self.evaluation_model.temp,
+                'response_format': {
+                    'type': 'json_schema',
+                    'json_schema': {'name': 'JudgeResponse', 'schema': schema, 'strict': True}
+                }
+            }
+        }
+
+    def evaluate_batch(self, transport: BatchTransport, work_dir: str, poll_interval: float = 30.0,
+                       timeout: float = None) -> List[Dict]:
+        """Evaluate all responses through an offline batch endpoint instead of one call per verdict."""
+        os.makedirs(work_dir, exist_ok=True)
+        requests_path = os.path.join(work_dir, 'judge_requests.jsonl')
+        # custom_id -> (conversation index, attempt); responses are read back from the store when needed
+        pending = {}
+        with open(requests_path, 'w', encoding='utf-8') as f:
+            for i, convo in enumerate(self.conversations):
+                if convo.question_id not in self.responses:
+                    self.results.append(self._missing_result(convo))
+                    continue
+                for j, response in enumerate(self.responses[convo.question_id]):
+                    journaled = self._journaled_result(convo, j, response)
+                    if journaled is not None:
+                        self.results.append(journaled)
+                        continue
+                    if self.cache is not None:
+                        cache_key = VerdictCache.make_key(self.evaluation_model.model, JUDGE_PROMPT, response, convo.target_question)
+                        cached = self.cache.get(cache_key)
+                        if cached is not None:
+                            result = self._judged_result(i, j, convo.axis, cached[0], cached[1], convo.pass_criteria)
+                            self._record(result, response)
+                            self.results.append(result)
+                            continue
+                    custom_id = f"{i}-{j}"
+                    pending[custom_id] = (i, j)
+                    f.write(json.dumps(self.batch_request(custom_id, response, convo), ensure_ascii=False) + '\n')
+
+        if pending:
+            self._run_batch(transport, requests_path, pending, poll_interval, timeout)
 
-        # Update results with final pass/fail status
+        # Batch results arrive in any order; put every question's results back in attempt order
+        position = {convo.question_id: i for i, convo in enumerate(self.conversations)}
+        self.results.sort(key=lambda result: (position.get(result['question_id'], len(position)),
+                                              result['attempt'] if isinstance(result['attempt'], int) else -1))
+        return self._finalize_results()
+
+    def _run_batch(self, transport: BatchTransport, requests_path: str, pending: Dict[str, Tuple[int, int]],
+                   poll_interval: float, timeout: float):
+        batch_id = transport.submit(requests_path)
+        print(f"Submitted judge batch {batch_id} with {len(pending)} requests")
+        started = time.monotonic()
+        while True:
+            status = transport.status(batch_id)
+            if status in ('completed', 'failed', 'expired', 'cancelled'):
+                break
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"Judge batch {batch_id} did not finish within {timeout} seconds (status: {status})")
+            time.sleep(poll_interval)
+
+        from src.judge_response import JudgeResponse
+        for record in transport.results(batch_id):
+            if record.get('custom_id') not in pending:
+                continue
+            i, j = pending.pop(record['custom_id'])
+            convo = self.conversations[i]
+            try:
+                if record.get('error'):
+                    raise RuntimeError(record['error'].get('message', record['error']))
+                body = record['response']['body']
+                if record['response'].get('status_code') != 200:
+                    raise RuntimeError(body.get('error', body))
+                judgement = JudgeResponse.model_validate_json(body['choices'][0]['message']['content'])
+                result = self._judged_result(i, j, convo.axis, judgement.reasoning, judgement.verdict, convo.pass_criteria)
+                response = self.responses[convo.question_id][j]
+                if self.cache is not None:
+                    self.cache.put(VerdictCache.make_key(self.evaluation_model.model, JUDGE_PROMPT, response, convo.target_question),
+                                   judgement.reasoning, judgement.verdict)
+                self._record(result, response)
+            except Exception as e:
+                result = self._error_result(i, e, j)
+            self.results.append(result)
+
+        # Requests the batch dropped (e.g. an expired batch) are failed like any other judge error
+        for i, j in pending.values():
+            self.results.append(self._error_result(i, RuntimeError(f"No result returned by batch {batch_id} ({status})"), j))
+
+    def _finalize_results(self) -> List[Dict]:
+        # Calculate the final pass/fail status for each question in one pass, then attach it to every result
+        aggregator = ScoreAggregator(self.results)
         for result in self.results:
-            question_id = result['question_id']
-            attempts = question_results[question_id]['attempts']
-            passes = question_results[question_id]['passes']
-            result['final_status'] = f"{'PASS' if passes > 0 else 'FAIL'} ({passes}/{attempts} attempts passed)"
+            result['final_status'] = aggregator.final_status(result['question_id'])
+
+        return self.results
+
+
+class JudgeCalls:
+    """One evaluator's judge calls, submitted in (conversation, attempt) order with at most `window` outstanding.
+
+    Workers get only the conversation index and attempt and read the response from the evaluator's store,
+    so response text is held in memory only for the calls in flight. Iterating yields (i, attempt, future)
+    in order and tops the window up as it goes.
+    """
+
+    def __init__(self, evaluator: Evaluator, executor: Executor, window: int):
+        self.evaluator = evaluator
+        self.executor = executor
+        self.window = max(1, window)
+        self.total = evaluator._slot_count()
+        self._slots = evaluator._slots()
+        self._in_flight = deque()
+        self._fill()
+
+    def _fill(self):
+        while len(self._in_flight) < self.window:
+            slot = next(self._slots, None)
+            if slot is None:
+                return
+            i, j = slot
+            if j is None:
+                future = Future()
+                future.set_result(self.evaluator._missing_result(self.evaluator.conversations[i]))
+            else:
+                future = self.executor.submit(self.evaluator.judge_slot, i, j, time.perf_counter())
+            self._in_flight.append((i, j, future))
+
+    def __iter__(self) -> Iterator[Tuple[int, Any, Future]]:
+        while self._in_flight:
+            i, j, future = self._in_flight.popleft()
+            self._fill()
+            yield i, j, future
 
-        return self.results
\ No newline at end of file
+    def __len__(self) -> int:
+        return self.total
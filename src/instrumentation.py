@@ -0,0 +1,173 @@
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, asdict, field
+from typing import Any, Dict, List, Optional, Tuple
+
+# The span for the provider call currently running in this thread or task, if it is being recorded
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+@dataclass
+class CallRecord:
+    phase: str                          # 'generate' or 'judge'
+    question_id: Any                    # a list of question IDs for a batched call
+    attempt: Any
+    axis: Any = None                    # a list with one axis per conversation for a batched call
+    start: float = 0.0                  # seconds since the recorder started
+    wall: float = 0.0                   # seconds from call start to completion, excluding queue_wait
+    ttfb: Optional[float] = None        # seconds from call start to the first response headers
+    queue_wait: float = 0.0             # seconds spent waiting for a worker or rate limit before the call started
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    http_requests: int = 0              # HTTP responses seen, including ones the client retried
+    retries: int = 0
+    samples: int = 1
+    cached: bool = False
+    error: Optional[str] = None
+    thread: int = field(default_factory=threading.get_ident)
+
+
+def report_usage(prompt_tokens: int, completion_tokens: int):
+    """Called by providers after a request to attribute token usage to the active span."""
+    span = _current_span.get()
+    if span is not None:
+        span.prompt_tokens += prompt_tokens or 0
+        span.completion_tokens += completion_tokens or 0
+
+
+def report_response(status_code: int):
+    """Called as response headers arrive; the first marks time to first byte, later ones are retries."""
+    span = _current_span.get()
+    if span is not None:
+        if span.ttfb is None:
+            span.ttfb = time.perf_counter() - span._started
+        span.http_requests += 1
+        span.retries = max(span.retries, span.http_requests - 1)
+
+
+def report_queue_wait(seconds: float):
+    """Called when a call inside the span had to wait for a rate limit or concurrency slot; the wait is moved out of wall and ttfb."""
+    span = _current_span.get()
+    if span is not None:
+        span.queue_wait += seconds
+        span._started += seconds
+        if span.http_requests == 0:
+            span.start += seconds
+
+
+def mark_cached():
+    span = _current_span.get()
+    if span is not None:
+        span.cached = True
+
+
+def span_or_null(recorder: Optional['Recorder'], phase: str, question_id: Any, attempt: Any, **kwargs):
+    """A recording span when a recorder is attached, otherwise a no-op context."""
+    if recorder is None:
+        return nullcontext()
+    return recorder.span(phase, question_id, attempt, **kwargs)
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of `values` (q in 0-100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, int(-(-q * len(ordered) // 100)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Recorder:
+    """Collects one CallRecord per provider or judge call and summarizes latency, tokens, retries and cost."""
+
+    def __init__(self):
+        self.records: List[CallRecord] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, phase: str, question_id: Any, attempt: Any, axis: Any = None,
+             queued_at: float = None, samples: int = 1):
+        """Time the enclosed call; `queued_at` is a time.perf_counter() taken when the work was enqueued."""
+        started = time.perf_counter()
+        record = CallRecord(phase=phase, question_id=question_id, attempt=attempt, axis=axis,
+                            start=started - self._origin, samples=samples,
+                            queue_wait=started - queued_at if queued_at is not None else 0.0)
+        record._started = started
+        token = _current_span.set(record)
+        try:
+            yield record
+        except BaseException as e:
+            record.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            record.wall = time.perf_counter() - record._started
+            with self._lock:
+                self.records.append(record)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per-phase call counts, error and retry totals, token totals and p50/p95/p99 latencies."""
+        phases = {}
+        for record in self.records:
+            phases.setdefault(record.phase, []).append(record)
+        summary = {}
+        for phase, records in phases.items():
+            live = [r for r in records if not r.cached]
+            stats = {
+                'calls': len(records),
+                'cached': len(records) - len(live),
+                'errors': sum(r.error is not None for r in records),
+                'retries': sum(r.retries for r in records),
+                'prompt_tokens': sum(r.prompt_tokens for r in records),
+                'completion_tokens': sum(r.completion_tokens for r in records),
+            }
+            for metric in ('wall', 'ttfb', 'queue_wait'):
+                values = [getattr(r, metric) for r in live if getattr(r, metric) is not None]
+                for q in (50, 95, 99):
+                    stats[f'{metric}_p{q}'] = percentile(values, q)
+            summary[phase] = stats
+        return summary
+
+    def axis_cost(self, prices: Dict[str, Tuple[float, float]]) -> Dict[str, Dict[str, float]]:
+        """Cost per axis and phase given {phase: (USD per 1M prompt tokens, USD per 1M completion tokens)}."""
+        costs = {}
+        for record in self.records:
+            if record.phase not in prices:
+                continue
+            prompt_price, completion_price = prices[record.phase]
+            cost = (record.prompt_tokens * prompt_price + record.completion_tokens * completion_price) / 1e6
+            # A batched call's cost is split evenly across the conversations it served
+            axes = record.axis if isinstance(record.axis, list) and record.axis else [record.axis]
+            for axis in axes:
+                axis_costs = costs.setdefault(axis or 'NA', {})
+                axis_costs[record.phase] = axis_costs.get(record.phase, 0.0) + cost / len(axes)
+        return costs
+
+    def write_summary(self, path: str, prices: Dict[str, Tuple[float, float]] = None):
+        report = {'phases': self.summary()}
+        if prices:
+            report['axis_cost_usd'] = self.axis_cost(prices)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    def export_chrome_trace(self, path: str):
+        """Write the calls as complete events in Chrome trace format (chrome://tracing, Perfetto)."""
+        events = []
+        for record in self.records:
+            args = {k: v for k, v in asdict(record).items() if k not in ('phase', 'start', 'wall', 'thread')}
+            events.append({
+                'name': record.phase,
+                'cat': record.phase,
+                'ph': 'X',
+                'ts': record.start * 1e6,
+                'dur': record.wall * 1e6,
+                'pid': 1,
+                'tid': record.thread,
+                'args': args
+            })
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from src.records import ResultRow, ResultTable, TextMap, TextStore
+
+
+def config_changes(saved: Dict, config: Dict) -> List[str]:
+    """Settings that differ between a saved run config and `config`, compared in the form configs are saved in."""
+    config = json.loads(json.dumps(config))
+    return sorted(key for key in set(saved) | set(config) if saved.get(key) != config.get(key))
+
+
+class VerdictTable(ResultTable):
+    """ResultTable of reusable verdicts that keeps each row's response digest as 32 raw bytes.
+
+    If `source` is given, every row reports it as its 'source' field.
+    """
+
+    DIGEST_SIZE = 32
+
+    def __init__(self, source: Optional[str] = None):
+        self.source = source
+        self._digests = bytearray()
+        super().__init__()
+
+    def append(self, result: Mapping):
+        with self._lock:
+            self._digests += bytes.fromhex(result['response_digest'])
+        super().append({k: v for k, v in result.items() if k not in ('response_digest', 'source')})
+
+    def _get(self, row: int, key: str) -> Any:
+        if key == 'response_digest':
+            return self._digests[row * self.DIGEST_SIZE:(row + 1) * self.DIGEST_SIZE].hex()
+        if key == 'source' and self.source is not None:
+            return self.source
+        return super()._get(row, key)
+
+    def _keys(self, row: int):
+        return super()._keys(row) + ['response_digest'] + (['source'] if self.source is not None else [])
+
+    def by_attempt(self) -> Dict[Tuple[Any, int], ResultRow]:
+        """{(question_id, attempt): row}, the form Evaluator.completed takes; later rows win."""
+        return {key: ResultRow(self, row) for row, key in enumerate(self.iter_fields('question_id', 'attempt'))}
+
+
+class RunJournal:
+    """Append-only, fsynced record of generated responses and judge verdicts for one run directory."""
+
+    RESPONSES_FILE = 'responses.jsonl'
+    VERDICTS_FILE = 'verdicts.jsonl'
+    CONFIG_FILE = 'run.json'
+
+    def __init__(self, run_dir: str):
+        self.run_dir = run_dir
+        os.makedirs(run_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._responses = open(os.path.join(run_dir, self.RESPONSES_FILE), 'a', encoding='utf-8')
+        self._verdicts = open(os.path.join(run_dir, self.VERDICTS_FILE), 'a', encoding='utf-8')
+
+    def _append(self, handle, record: Dict):
+        line = json.dumps(record, ensure_ascii=False) + '\n'
+        with self._lock:
+            handle.write(line)
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def record_response(self, question_id: Any, attempt: int, response: str):
+        """Durably append one generated response."""
+        self._append(self._responses, {'question_id': question_id, 'attempt': attempt, 'response': response})
+
+    @staticmethod
+    def response_digest(response: str) -> str:
+        return hashlib.sha256(str(response).encode('utf-8')).hexdigest()
+
+    def record_verdict(self, result: Dict, response: str):
+        """Durably append one judged result, tagged with a digest of the response it judged."""
+        record = {k: v for k, v in result.items() if k != 'final_status'}
+        record['response_digest'] = self.response_digest(response)
+        self._append(self._verdicts, record)
+
+    def _read(self, name: str):
+        path = os.path.join(self.run_dir, name)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a partially written final line; that call is simply redone
+                    continue
+
+    def load_responses(self) -> Dict[Any, TextMap]:
+        """Return {question_id: {attempt: response}} for every journaled response, with the text held in a TextStore."""
+        store = TextStore()
+        responses = {}
+        for record in self._read(self.RESPONSES_FILE):
+            responses.setdefault(record['question_id'], TextMap(store))[record['attempt']] = record['response']
+        return responses
+
+    def load_verdicts(self) -> Dict[Tuple[Any, int], ResultRow]:
+        """Return {(question_id, attempt): record} for every journaled verdict, including its response_digest.
+
+        The records are rows of a VerdictTable, so their reasoning text is held in a TextStore.
+        """
+        table = VerdictTable()
+        table.extend(self._read(self.VERDICTS_FILE))
+        return table.by_attempt()
+
+    def save_config(self, config: Dict):
+        with open(os.path.join(self.run_dir, self.CONFIG_FILE), 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2)
+
+    def claim(self, config: Dict) -> bool:
+        """Save `config` for a new run, or check it against the run already journaled here.
+
+        Returns True when this directory already holds a run with the same config, which then resumes.
+        Raises ValueError if it holds a run with different settings, or journaled calls with no config.
+        """
+        saved = self.load_config()
+        if not saved:
+            if self.has_records():
+                raise ValueError(f"{self.run_dir} already holds journaled calls from an unknown run")
+            self.save_config(config)
+            return False
+        changed = config_changes(saved, config)
+        if changed:
+            raise ValueError(f"{self.run_dir} already holds a run with different settings ({', '.join(changed)})")
+        return True
+
+    def has_records(self) -> bool:
+        return any(os.path.getsize(os.path.join(self.run_dir, name)) > 0
+                   for name in (self.RESPONSES_FILE, self.VERDICTS_FILE)
+                   if os.path.exists(os.path.join(self.run_dir, name)))
+
+    def load_config(self) -> Dict:
+        path = os.path.join(self.run_dir, self.CONFIG_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def close(self):
+        with self._lock:
+            self._responses.close()
+            self._verdicts.close()
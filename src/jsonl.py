@@ -0,0 +1,73 @@
+import glob
+import gzip
+import io
+import json
+import mmap
+import os
+from typing import Any, Iterator, List, Tuple, Union
+
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+
+class RecordError(ValueError):
+    """A malformed or invalid record, located by file and line number."""
+
+    def __init__(self, path: str, line_number: int, message: str):
+        self.path = path
+        self.line_number = line_number
+        super().__init__(f"{path}:{line_number}: {message}")
+
+
+def expand_paths(paths: Union[str, List[str]]) -> List[str]:
+    """Expand a path, glob or list of them into a sorted list of existing files."""
+    if isinstance(paths, str):
+        paths = [paths]
+    expanded = []
+    for path in paths:
+        matches = sorted(glob.glob(path))
+        if not matches:
+            raise FileNotFoundError(f"No files match '{path}'")
+        expanded.extend(matches)
+    return expanded
+
+
+def _open_binary(path: str, use_mmap: bool):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError(f"Reading {path} requires the 'zstandard' package.")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    if use_mmap and os.path.getsize(path) > 0:
+        with open(path, 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return open(path, 'rb')
+
+
+def _lines(handle) -> Iterator[bytes]:
+    if isinstance(handle, mmap.mmap):
+        # mmap has readline but is not iterable line by line
+        return iter(handle.readline, b'')
+    return iter(io.BufferedReader(handle) if not hasattr(handle, 'peek') else handle)
+
+
+def iter_jsonl(paths: Union[str, List[str]], use_mmap: bool = False) -> Iterator[Tuple[str, int, Any]]:
+    """Stream (path, line_number, record) from JSONL files, transparently decompressing .gz and .zst."""
+    for path in expand_paths(paths):
+        handle = _open_binary(path, use_mmap)
+        try:
+            for line_number, line in enumerate(_lines(handle), start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield path, line_number, loads(line)
+                except ValueError as e:
+                    raise RecordError(path, line_number, f"invalid JSON: {e}") from None
+        finally:
+            handle.close()
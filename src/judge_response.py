@@ -0,0 +1,6 @@
+from typing import Literal
+from pydantic import BaseModel
+
+class JudgeResponse(BaseModel):
+    reasoning: str
+    verdict: Literal["YES", "NO"]
@@ -0,0 +1,107 @@
+import glob
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List
+from src.cache import VerdictCache
+from src.data_loader import DataLoader
+from src.evaluator import Evaluator, JUDGE_MODEL
+from src.result_parser import ResultParser
+
+
+class DedupJudge:
+    """Wraps a judge so identical prompts, across any number of evaluators, are sent only once."""
+
+    def __init__(self, judge: Any):
+        self.judge = judge
+        self.model = judge.model
+        self.temp = getattr(judge, 'temp', 0)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    def generate(self, prompt: Any):
+        key = json.dumps(prompt, sort_keys=True)
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self.calls += 1
+            else:
+                self.deduplicated += 1
+        if not owner:
+            return future.result()
+        try:
+            future.set_result(self.judge.generate(prompt))
+        except Exception as e:
+            future.set_exception(e)
+            # Let a later duplicate retry instead of inheriting a transient failure
+            with self._lock:
+                del self._inflight[key]
+        return future.result()
+
+
+def model_name(path: str) -> str:
+    """Leaderboard name for a response file, e.g. 'gpt-4o-2024-08-06' for 'gpt-4o-2024-08-06_responses.jsonl'."""
+    name = os.path.basename(path)
+    for suffix in ('.jsonl', '_responses'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+
+class Leaderboard:
+    """Scores several models' response files against one conversation set with a single shared judge."""
+
+    def __init__(self, data_loader: DataLoader, response_files: List[str], cache: VerdictCache = None,
+                 evaluation_model: Any = None):
+        self.data_loader = data_loader
+        self.response_files = sorted(response_files)
+        self.cache = cache
+        if evaluation_model is None:
+            from src.models.openai import OpenAIModel
+            from src.judge_response import JudgeResponse
+            evaluation_model = OpenAIModel(model=JUDGE_MODEL, temp=0, response_format=JudgeResponse)
+        self.judge = DedupJudge(evaluation_model)
+
+    @classmethod
+    def from_glob(cls, data_loader: DataLoader, pattern: str, **kwargs) -> 'Leaderboard':
+        files = glob.glob(pattern)
+        if not files:
+            raise ValueError(f"No response files match '{pattern}'")
+        return cls(data_loader, files, **kwargs)
+
+    def run(self, max_workers: int = 1) -> Dict[str, Dict]:
+        """Judge every model's responses through one executor and return {model: scores}, best first."""
+        conversations = self.data_loader.get_conversations()
+        evaluators = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = []
+            # Start every model's judge calls before waiting on any, so the executor stays saturated; each model
+            # keeps a bounded window of calls queued and tops it up while its results are collected
+            for path in self.response_files:
+                responses = self.data_loader.load_responses(path)
+                evaluator = Evaluator(conversations, responses, cache=self.cache, evaluation_model=self.judge)
+                evaluators[model_name(path)] = evaluator
+                pending.append((model_name(path), evaluator, evaluator.submit(executor, window=4 * max_workers)))
+
+            for name, evaluator, futures in pending:
+                evaluator.collect(futures, desc=f"Evaluating {name}")
+
+        scores = {name: ResultParser(evaluator.results).calculate_scores() for name, evaluator in evaluators.items()}
+        return dict(sorted(scores.items(), key=lambda item: item[1]['overall_score'], reverse=True))
+
+    @staticmethod
+    def format_table(scores: Dict[str, Dict]) -> str:
+        """Render scores as a fixed-width comparison table with one row per model."""
+        axes = sorted({axis for model_scores in scores.values() for axis in model_scores['axis_scores']})
+        headers = ['Model', 'Overall'] + axes
+        rows = [[name, f"{s['overall_score']:.2f}"] + [f"{s['axis_scores'][a]:.2f}" if a in s['axis_scores'] else '-' for a in axes]
+                for name, s in scores.items()]
+        widths = [max(len(str(row[c])) for row in [headers] + rows) for c in range(len(headers))]
+        lines = ['  '.join(str(cell).ljust(w) for cell, w in zip(row, widths)).rstrip() for row in [headers] + rows]
+        lines.insert(1, '  '.join('-' * w for w in widths))
+        return '\n'.join(lines) + '\n'
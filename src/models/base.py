@@ -1,9 +1,33 @@
+import asyncio
 from abc import ABC, abstractmethod
+from typing import List, Dict
 
 class ModelProvider(ABC):
     """Abstract base class for all model providers."""
 
+    # Providers that set this run many conversations per call through `generate_batch`
+    supports_batching = False
+    batch_size = 1
+    # Providers that set this answer n samples for one prompt in a single call through `generate_n`
+    supports_n = False
+
     @abstractmethod
     def generate(self, prompt: str) -> str:
         """Generates a response for the given prompt."""
-        pass
\ No newline at end of file
+        pass
+
+    async def agenerate(self, prompt: str) -> str:
+        """Asynchronously generates a response. Providers without a native async client run `generate` in a thread."""
+        return await asyncio.to_thread(self.generate, prompt)
+
+    def generate_n(self, prompt: str, n: int) -> List[str]:
+        """Generates n samples for one prompt. Providers that can share work across samples override this."""
+        return [self.generate(prompt) for _ in range(n)]
+
+    async def agenerate_n(self, prompt: str, n: int) -> List[str]:
+        """Asynchronously generates n samples for one prompt. Providers without a native async client run `generate_n` in a thread."""
+        return await asyncio.to_thread(self.generate_n, prompt, n)
+
+    def generate_batch(self, chats: List[List[Dict]], num_return_sequences: int = 1) -> List[List[str]]:
+        """Generates `num_return_sequences` responses for each chat. Defaults to one `generate` call per sample."""
+        return [[self.generate(chat) for _ in range(num_return_sequences)] for chat in chats]
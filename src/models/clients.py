@@ -0,0 +1,87 @@
+import asyncio
+import importlib.util
+import threading
+import weakref
+from typing import TYPE_CHECKING, Dict, Tuple
+from src.instrumentation import report_response
+
+# httpx and openai are imported when the first client is created, so configuring the pool is free
+if TYPE_CHECKING:
+    import httpx
+    from openai import OpenAI, AsyncOpenAI
+
+# Process-wide registry of OpenAI clients keyed by (base_url, api_key), so every provider and judge
+# talking to the same endpoint shares one keep-alive connection pool
+_clients: Dict[Tuple[str, str], 'OpenAI'] = {}
+# Async connection pools belong to the event loop that opened them, so async clients are kept per loop
+_async_clients = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+_pool = {'max_connections': 100, 'keepalive_expiry': 60.0}
+
+
+def configure_pool(max_connections: int, keepalive_expiry: float = 60.0):
+    """Size the connection pool of clients created from now on, typically to the configured worker count."""
+    _pool['max_connections'] = max(1, int(max_connections))
+    _pool['keepalive_expiry'] = keepalive_expiry
+
+
+def _limits() -> 'httpx.Limits':
+    import httpx
+    return httpx.Limits(
+        max_connections=_pool['max_connections'],
+        max_keepalive_connections=_pool['max_connections'],
+        keepalive_expiry=_pool['keepalive_expiry']
+    )
+
+
+def _http2() -> bool:
+    # httpx only speaks HTTP/2 when the optional h2 package is installed
+    return importlib.util.find_spec('h2') is not None
+
+
+def _on_response(response: 'httpx.Response'):
+    report_response(response.status_code)
+
+
+async def _aon_response(response: 'httpx.Response'):
+    report_response(response.status_code)
+
+
+def get_client(api_key: str, base_url: str = None) -> 'OpenAI':
+    """Return the shared synchronous client for an endpoint, creating it on first use."""
+    from openai import OpenAI, DefaultHttpxClient
+    key = (base_url, api_key)
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                http_client=DefaultHttpxClient(limits=_limits(), http2=_http2(),
+                                               event_hooks={'response': [_on_response]})
+            )
+        return client
+
+
+def get_async_client(api_key: str, base_url: str = None) -> 'AsyncOpenAI':
+    """Return the shared async client for an endpoint on the running event loop, creating it on first use.
+
+    Async clients are only used under AsyncEngine, so they make a single attempt per call.
+    """
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    key = (base_url, api_key)
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(key)
+        if client is None:
+            client = clients[key] = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                # AsyncEngine retries with its own backoff and throttles concurrency on 429s, which SDK retries would hide
+                max_retries=0,
+                http_client=DefaultAsyncHttpxClient(limits=_limits(), http2=_http2(),
+                                                    event_hooks={'response': [_aon_response]})
+            )
+        return client
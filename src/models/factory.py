@@ -1,28 +1,51 @@
+import importlib
+from importlib.metadata import entry_points
 from src.models.base import ModelProvider
-from src.models.huggingface import HuggingFaceModel
-from src.models.openai import OpenAIModel
-from typing import Dict, Type
+from typing import Dict, Tuple, Type, Union
+
+# Entry point group through which installed packages can contribute providers
+ENTRY_POINT_GROUP = 'multichallenge.providers'
 
 
 class ModelFactory:
     """Factory to create model providers based on the user input."""
 
-    # Registry of available model providers
-    providers: Dict[str, Type[ModelProvider]] = {
-        'huggingface': HuggingFaceModel,
-        'openai': OpenAIModel,
+    # Registry of available model providers. Built-in ones are 'module:Class' paths imported on first use,
+    # so e.g. torch and transformers are only loaded when the huggingface provider is requested
+    providers: Dict[str, Union[str, Type[ModelProvider]]] = {
+        'huggingface': 'src.models.huggingface:HuggingFaceModel',
+        'openai': 'src.models.openai:OpenAIModel',
+        'mock': 'src.models.mock:MockModel',
     }
 
+    # Providers already built, keyed by name and arguments, so repeated requests reuse one instance
+    _instances: Dict[Tuple, ModelProvider] = {}
+
     @classmethod
-    def register_provider(cls, name: str, provider: Type[ModelProvider]):
-        """Register a new model provider."""
+    def register_provider(cls, name: str, provider: Union[str, Type[ModelProvider]]):
+        """Register a new model provider, either a class or a 'module:Class' path to import on first use."""
         cls.providers[name] = provider
 
+    @classmethod
+    def provider_class(cls, provider_name: str) -> Type[ModelProvider]:
+        """Resolve a provider name, falling back to installed entry points, and import it if needed."""
+        provider = cls.providers.get(provider_name)
+        if provider is None:
+            matches = entry_points(group=ENTRY_POINT_GROUP, name=provider_name)
+            if not matches:
+                raise ValueError(f"Model provider '{provider_name}' is not supported.")
+            provider = next(iter(matches)).load()
+        elif isinstance(provider, str):
+            module_name, _, class_name = provider.partition(':')
+            provider = getattr(importlib.import_module(module_name), class_name)
+        cls.providers[provider_name] = provider
+        return provider
+
     @classmethod
     def get_provider(cls, provider_name: str, **kwargs) -> ModelProvider:
         """Create an instance of the requested model provider."""
-        if provider_name not in cls.providers:
-            raise ValueError(f"Model provider '{provider_name}' is not supported.")
-
-        # Initialize the provider with the provided keyword arguments
-        return cls.providers[provider_name](**kwargs)
\ No newline at end of file
+        key = (provider_name, tuple(sorted((k, repr(v)) for k, v in kwargs.items())))
+        if key not in cls._instances:
+            # Initialize the provider with the provided keyword arguments
+            cls._instances[key] = cls.provider_class(provider_name)(**kwargs)
+        return cls._instances[key]
\ No newline at end of file
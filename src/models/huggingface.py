@@ -1,13 +1,21 @@
-from transformers import pipeline
+from transformers import pipeline, DynamicCache
 from src.models.base import ModelProvider
+from src.instrumentation import report_usage
+import threading
 import torch
 import os
 from typing import List, Dict
 
 class HuggingFaceModel(ModelProvider):
-    def __init__(self, model_path: str, temp: float, top_p: float):
-        self.temp = temp
-        self.top_p = top_p
+    supports_batching = True
+    supports_n = True
+
+    def __init__(self, model_path: str, temp: float, top_p: float, max_new_tokens: int = 2000, batch_size: int = 8):
+        # Provider args arrive from the command line as strings
+        self.temp = float(temp)
+        self.top_p = float(top_p)
+        self.max_new_tokens = int(max_new_tokens)
+        self.batch_size = int(batch_size)
         api_key = os.getenv("HUGGINGFACE_TOKEN")
         if not api_key:
             raise ValueError("HUGGINGFACE_TOKEN is not set in the .env file.")
@@ -16,15 +24,80 @@ class HuggingFaceModel(ModelProvider):
             model=model_path,
             torch_dtype=torch.bfloat16,
             device_map="auto",
-            batch_size=8
+            batch_size=self.batch_size
         )
+        tokenizer = self.generator.tokenizer
+        # Batched decoder-only generation needs a pad token and left padding
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token_id = tokenizer.eos_token_id
+        tokenizer.padding_side = 'left'
+        # One model instance: concurrent callers are serialized instead of contending for the device
+        self._lock = threading.Lock()
+
+    def _generation_kwargs(self, num_return_sequences: int = 1) -> Dict:
+        kwargs = {'max_new_tokens': self.max_new_tokens, 'num_return_sequences': num_return_sequences}
+        if self.temp > 0:
+            kwargs.update(do_sample=True, temperature=self.temp, top_p=self.top_p)
+        else:
+            kwargs['do_sample'] = False
+        return kwargs
+
     def generate(self, chat: List[Dict]) -> str:
         """Generate a response from the model."""
-        response = self.generator(
-            chat,
-            max_new_tokens=2000,
-            temperature=self.temp,
-            top_p=self.top_p,
-            do_sample=True  # Required when using temperature/top_p
-        )
-        return response[0]['generated_text'][-1]['content']
+        with self._lock:
+            response = self.generator(chat, **self._generation_kwargs())
+        response = response[0]['generated_text'][-1]['content']
+        self._report_pipeline_usage([chat], [response])
+        return response
+
+    def generate_batch(self, chats: List[List[Dict]], num_return_sequences: int = 1) -> List[List[str]]:
+        """Generate `num_return_sequences` responses for each chat, prefilling each chat once when there are several."""
+        if num_return_sequences > 1:
+            return self._generate_from_prefill(chats, num_return_sequences)
+        with self._lock:
+            outputs = self.generator(chats, batch_size=len(chats), **self._generation_kwargs(num_return_sequences))
+        outputs = [[sample['generated_text'][-1]['content'] for sample in output] for output in outputs]
+        self._report_pipeline_usage(chats, [sample for samples in outputs for sample in samples])
+        return outputs
+
+    def generate_n(self, chat: List[Dict], n: int) -> List[str]:
+        """Generate n samples for one chat, prefilling the shared conversation prefix only once."""
+        if n <= 1:
+            return [self.generate(chat) for _ in range(n)]
+        return self._generate_from_prefill([chat], n)[0]
+
+    def _report_pipeline_usage(self, chats: List[List[Dict]], samples: List[str]):
+        """Report token usage for a pipeline call, which returns only text, by re-tokenizing its prompts and samples."""
+        tokenizer = self.generator.tokenizer
+        report_usage(sum(len(tokenizer.apply_chat_template(chat, add_generation_prompt=True)) for chat in chats),
+                     sum(len(tokenizer.encode(sample, add_special_tokens=False)) for sample in samples))
+
+    def _generate_from_prefill(self, chats: List[List[Dict]], n: int) -> List[List[str]]:
+        """Prefill the chats as one left-padded batch, then decode n samples per chat from copies of its KV cache."""
+        tokenizer = self.generator.tokenizer
+        model = self.generator.model
+        with self._lock:
+            inputs = tokenizer.apply_chat_template(chats, add_generation_prompt=True, padding=True,
+                                                   return_dict=True, return_tensors='pt').to(model.device)
+            input_ids, attention_mask = inputs['input_ids'], inputs['attention_mask']
+            # Left padding: positions count real tokens only, as generate() computes them
+            position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+            prompt_cache = DynamicCache()
+            with torch.no_grad():
+                # Prefill all but the last prompt token; generate() feeds that token itself
+                model(input_ids[:, :-1], attention_mask=attention_mask[:, :-1], position_ids=position_ids[:, :-1],
+                      past_key_values=prompt_cache, use_cache=True)
+            # Every sample decodes from a copy of its chat's KV cache instead of re-encoding the conversation
+            prompt_cache.batch_repeat_interleave(n)
+            output = model.generate(
+                input_ids.repeat_interleave(n, dim=0),
+                attention_mask=attention_mask.repeat_interleave(n, dim=0),
+                past_key_values=prompt_cache,
+                pad_token_id=tokenizer.pad_token_id,
+                **self._generation_kwargs()
+            )
+        generated = output[:, input_ids.shape[1]:]
+        # Each chat's prompt is counted once, as the API providers report n samples; padding is not usage
+        report_usage(int(attention_mask.sum()), int((generated != tokenizer.pad_token_id).sum()))
+        samples = tokenizer.batch_decode(generated, skip_special_tokens=True)
+        return [samples[start:start + n] for start in range(0, len(samples), n)]
@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from typing import Any, List
+from src.models.base import ModelProvider
+from src.instrumentation import report_usage, report_response
+
+
+class MockAPIError(Exception):
+    """Error raised by the mock provider, carrying an HTTP status like the OpenAI client errors do."""
+
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class MockModel(ModelProvider):
+    """Deterministic offline provider for exercising the harness without a live endpoint.
+
+    Responses are derived from a hash of the prompt and how many samples were already drawn for it, so
+    repeated attempts at one prompt differ, whether asked for one at a time or n per call, and reruns
+    produce identical text. Verdicts depend on the prompt only.
+    Latency is log-normally distributed around `latency` seconds, and `error_rate` / `rate_limit_rate`
+    make that fraction of calls fail with a 500 or 429. Given a `response_format` (e.g. JudgeResponse)
+    it acts as a judge and returns a YES verdict for roughly `pass_rate` of prompts.
+    """
+
+    supports_n = True
+
+    def __init__(self, model: str = 'mock', temp: float = 0, latency: float = 0.05, latency_sigma: float = 0.5,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, pass_rate: float = 0.5,
+                 response_tokens: int = 200, seed: int = 0, response_format: Any = None):
+        # Provider args arrive from the command line as strings
+        self.model = model
+        self.temp = float(temp)
+        self.latency = float(latency)
+        self.latency_sigma = float(latency_sigma)
+        self.error_rate = float(error_rate)
+        self.rate_limit_rate = float(rate_limit_rate)
+        self.pass_rate = float(pass_rate)
+        self.response_tokens = int(response_tokens)
+        self.response_format = response_format or False
+        self._random = random.Random(int(seed))
+        self._lock = threading.Lock()
+        self._drawn = {}  # samples generated so far, by prompt digest
+
+    def _digest(self, prompt: Any, sample: int) -> bytes:
+        return hashlib.sha256(json.dumps([self.model, prompt, sample], sort_keys=True).encode('utf-8')).digest()
+
+    def _draw(self):
+        """Pick this call's latency and failure mode."""
+        with self._lock:
+            delay = self.latency * self._random.lognormvariate(0, self.latency_sigma) if self.latency > 0 else 0.0
+            roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            return delay, MockAPIError(429, "Mock rate limit exceeded")
+        if roll < self.rate_limit_rate + self.error_rate:
+            return delay, MockAPIError(500, "Mock server error")
+        return delay, None
+
+    def _next_samples(self, prompt: Any, n: int) -> range:
+        """Sample numbers for this call: a judge answers a prompt the same way every time, a generator moves on."""
+        if self.response_format:
+            return range(n)
+        key = self._digest(prompt, None)
+        with self._lock:
+            start = self._drawn.get(key, 0)
+            self._drawn[key] = start + n
+        return range(start, start + n)
+
+    def _respond(self, prompt: Any, sample: int):
+        digest = self._digest(prompt, sample)
+        if self.response_format:
+            verdict = "YES" if int.from_bytes(digest[:4], 'big') / 2 ** 32 < self.pass_rate else "NO"
+            return self.response_format(reasoning=f"Mock judgement {digest.hex()[:16]}", verdict=verdict)
+        words = [digest.hex()[i % 64:i % 64 + 6] for i in range(self.response_tokens)]
+        return ' '.join(words)
+
+    def _samples(self, prompt: Any, n: int, error: Exception) -> List[Any]:
+        report_response(error.status_code if error else 200)
+        if error:
+            raise error
+        # The prompt is sent once per call however many samples come back
+        report_usage(len(json.dumps(prompt)) // 4, self.response_tokens * n)
+        return [self._respond(prompt, sample) for sample in self._next_samples(prompt, n)]
+
+    def generate(self, prompt: Any):
+        return self.generate_n(prompt, 1)[0]
+
+    def generate_n(self, prompt: Any, n: int) -> List[Any]:
+        delay, error = self._draw()
+        time.sleep(delay)
+        return self._samples(prompt, n, error)
+
+    async def agenerate(self, prompt: Any):
+        return (await self.agenerate_n(prompt, 1))[0]
+
+    async def agenerate_n(self, prompt: Any, n: int) -> List[Any]:
+        delay, error = self._draw()
+        await asyncio.sleep(delay)
+        return self._samples(prompt, n, error)
@@ -1,36 +1,64 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
+from functools import lru_cache
 import os
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 from src.models.base import ModelProvider
+from src.models.clients import get_client, get_async_client
+from src.instrumentation import report_usage
+
+@lru_cache(maxsize=None)
+def resolve_credentials(model: str) -> Tuple[str, str]:
+    """Return (api_key, base_url) for a model from the environment, read once per model name."""
+    if "gpt" in model:
+        return os.getenv("OPENAI_API_KEY"), os.getenv("OPENAI_BASE_URL")
+    elif "Nexusflow" in model or "Qwen" in model:
+        return os.getenv("NEXUSFLOW_API_KEY"), os.getenv("NEXUSFLOW_BASE_URL")
+    else:
+        raise ValueError("API_KEY is not set in the .env file.")
 
 class OpenAIModel(ModelProvider):
     """OpenAI model provider that uses GPT-4 for evaluation."""
 
-    def __init__(self, model: str, temp: float, response_format: Any = None):
+    supports_n = True
+
+    def __init__(self, model: str, temp: float, response_format: Any = None, base_url: str = None, api_key: str = None):
         """Initialize OpenAI API with the environment variable and other necessary parameters."""
-        if "gpt" in model:
-            api_key = os.getenv("OPENAI_API_KEY")
-            base_url = os.getenv("OPENAI_BASE_URL")
-        elif "Nexusflow" in model or "Qwen" in model:
-            api_key = os.getenv("NEXUSFLOW_API_KEY")
-            base_url = os.getenv("NEXUSFLOW_BASE_URL")
+        if base_url or api_key:
+            # Explicit endpoint, e.g. a local OpenAI-compatible fake server
+            api_key = api_key or os.getenv("OPENAI_API_KEY") or "EMPTY"
         else:
-            raise ValueError("API_KEY is not set in the .env file.")
+            api_key, base_url = resolve_credentials(model)
         
-        self.client = OpenAI(api_key=api_key, base_url=base_url)
+        self.api_key = api_key
+        self.base_url = base_url
+        # Clients come from a process-wide registry so providers on the same endpoint share one connection pool
+        self.client = get_client(api_key, base_url)
 
         self.model = model
         self.temp = float(temp)
         self.response_format = response_format or False
 
-    def generate(self, prompt:Any):
-        """Generate a response using the OpenAI GPT-4 model."""
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Shared async client for the running event loop, created on first use so synchronous runs never build one."""
+        return get_async_client(self.api_key, self.base_url)
+
+    @staticmethod
+    def _report(response: Any):
+        if getattr(response, 'usage', None) is not None:
+            report_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+
+    def _normalize_prompt(self, prompt: Any):
         if type(prompt) == str:
-            prompt = [{"role": "user", "content": prompt}]
+            return [{"role": "user", "content": prompt}]
         elif isinstance(prompt, list) and all(isinstance(item, dict) and 'role' in item and item['role'] in ['user', 'assistant'] for item in prompt):
-            pass 
+            return prompt
         else:
             raise ValueError("Prompt must be a string or a list of dictionaries with 'role' keys as 'user' or 'assistant'.")
+
+    def generate(self, prompt:Any):
+        """Generate a response using the OpenAI GPT-4 model."""
+        prompt = self._normalize_prompt(prompt)
         
         if self.response_format:
             response = self.client.beta.chat.completions.parse(
@@ -39,6 +67,7 @@ class OpenAIModel(ModelProvider):
                 temperature=self.temp,
                 response_format=self.response_format
             )
+            self._report(response)
             return response.choices[0].message.parsed
         else:
             response = self.client.chat.completions.create(
@@ -46,4 +75,60 @@ class OpenAIModel(ModelProvider):
                 messages = prompt,
                 temperature = self.temp
             )
+            self._report(response)
+            return response.choices[0].message.content
+
+    async def agenerate(self, prompt: Any):
+        """Generate a response using the async OpenAI client."""
+        prompt = self._normalize_prompt(prompt)
+
+        if self.response_format:
+            response = await self.async_client.beta.chat.completions.parse(
+                model=self.model,
+                messages=prompt,
+                temperature=self.temp,
+                response_format=self.response_format
+            )
+            self._report(response)
+            return response.choices[0].message.parsed
+        else:
+            response = await self.async_client.chat.completions.create(
+                model = self.model,
+                messages = prompt,
+                temperature = self.temp
+            )
+            self._report(response)
             return response.choices[0].message.content
+
+    def _choices(self, response: Any):
+        if self.response_format:
+            return [choice.message.parsed for choice in response.choices]
+        return [choice.message.content for choice in response.choices]
+
+    def generate_n(self, prompt: Any, n: int) -> List[Any]:
+        """Generate n samples for one prompt in a single request using the API's `n` parameter."""
+        if n <= 1:
+            return [self.generate(prompt) for _ in range(n)]
+        prompt = self._normalize_prompt(prompt)
+        create = self.client.beta.chat.completions.parse if self.response_format else self.client.chat.completions.create
+        kwargs = {'response_format': self.response_format} if self.response_format else {}
+        response = create(model=self.model, messages=prompt, temperature=self.temp, n=n, **kwargs)
+        self._report(response)
+        samples = self._choices(response)
+        # Some OpenAI-compatible servers ignore `n`; make up the difference with separate calls
+        samples.extend(self.generate(prompt) for _ in range(n - len(samples)))
+        return samples[:n]
+
+    async def agenerate_n(self, prompt: Any, n: int) -> List[Any]:
+        """Async counterpart of `generate_n`."""
+        if n <= 1:
+            return [await self.agenerate(prompt) for _ in range(n)]
+        prompt = self._normalize_prompt(prompt)
+        create = self.async_client.beta.chat.completions.parse if self.response_format else self.async_client.chat.completions.create
+        kwargs = {'response_format': self.response_format} if self.response_format else {}
+        response = await create(model=self.model, messages=prompt, temperature=self.temp, n=n, **kwargs)
+        self._report(response)
+        samples = self._choices(response)
+        for _ in range(n - len(samples)):
+            samples.append(await self.agenerate(prompt))
+        return samples[:n]
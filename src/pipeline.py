@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict
+from src.data_loader import DataLoader
+from src.evaluator import Evaluator
+from src.result_parser import ResultParser
+from src.models.base import ModelProvider
+from tqdm import tqdm
+
+_DONE = object()
+
+
+class Pipeline:
+    """Generate-then-judge pipeline: each response is judged as soon as it is generated."""
+
+    def __init__(self, data_loader: DataLoader, evaluator: Evaluator, parser: ResultParser,
+                 queue_size: int = 64, score_every: int = 50):
+        self.data_loader = data_loader
+        self.evaluator = evaluator
+        self.parser = parser
+        # Share one result table so each result is stored once
+        evaluator.results = parser.evaluation_results
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.score_every = score_every
+        self._lock = threading.Lock()
+
+    def _generate(self, model_provider: ModelProvider, i: int, attempt: int, queued_at: float):
+        conversation = self.data_loader.conversations[i]
+        response = self.data_loader.generate_attempt(model_provider, conversation, attempt, queued_at)
+        self.data_loader.responses[conversation.question_id][attempt] = response
+        # Blocks while the judge is behind, bounding the number of unjudged responses held in memory
+        self.queue.put((i, attempt, response, time.perf_counter()))
+
+    def _generate_all(self, model_provider: ModelProvider, i: int, attempts: int, queued_at: float):
+        """Generate every attempt of one conversation in one `generate_n` call, then queue each for the judge."""
+        conversation = self.data_loader.conversations[i]
+        responses = self.data_loader.generate_attempts(model_provider, conversation, attempts, queued_at)
+        for attempt, response in enumerate(responses):
+            self.data_loader.responses[conversation.question_id][attempt] = response
+            self.queue.put((i, attempt, response, time.perf_counter()))
+
+    def _judge(self, progress: tqdm):
+        while True:
+            item = self.queue.get()
+            if item is _DONE:
+                return
+            i, attempt, response, queued_at = item
+            self._collect(self.evaluator.judge_attempt(i, attempt, response, queued_at), progress)
+
+    def _collect(self, result: Dict, progress: tqdm, skipped: int = 0):
+        with self._lock:
+            self.parser.add_result(result)
+            progress.update(1 + skipped)
+            if len(self.parser.evaluation_results) % self.score_every == 0:
+                progress.set_postfix(overall=f"{self.parser.calculate_scores()['overall_score']:.1f}%")
+
+    def _generate_until_pass(self, model_provider: ModelProvider, i: int, attempts: int, progress: tqdm, queued_at: float):
+        """Generate and judge one attempt at a time, generating no further attempts once one passes."""
+        conversation = self.data_loader.conversations[i]
+        responses = self.data_loader.responses[conversation.question_id]
+        for attempt in range(attempts):
+            response = self.data_loader.generate_attempt(model_provider, conversation, attempt, queued_at)
+            queued_at = None
+            responses[attempt] = response
+            result = self.evaluator.judge_attempt(i, attempt, response)
+            passed = result['passed']
+            self._collect(result, progress, skipped=attempts - attempt - 1 if passed else 0)
+            if passed:
+                del responses[attempt + 1:]
+                return
+
+    def run(self, model_provider: ModelProvider, attempts: int = 1,
+            gen_workers: int = 1, eval_workers: int = 1, early_exit: bool = False) -> List[Dict]:
+        """Run generation and judging concurrently, streaming results into the parser.
+
+        With `early_exit`, each of `gen_workers` threads takes one conversation at a time and alternates
+        generating and judging its attempts, stopping at the first pass.
+        """
+        conversations = self.data_loader.conversations
+        for conversation in conversations:
+            self.data_loader.responses[conversation.question_id] = [None] * attempts
+
+        progress = tqdm(total=len(conversations) * attempts, desc="Generating and evaluating")
+        if early_exit:
+            with ThreadPoolExecutor(max_workers=gen_workers) as executor:
+                futures = [executor.submit(self._generate_until_pass, model_provider, i, attempts, progress, time.perf_counter())
+                           for i in range(len(conversations))]
+                for future in futures:
+                    future.result()
+            progress.close()
+            return self._finish()
+
+        judges = [threading.Thread(target=self._judge, args=(progress,), daemon=True) for _ in range(eval_workers)]
+        for judge in judges:
+            judge.start()
+
+        with ThreadPoolExecutor(max_workers=gen_workers) as executor:
+            if model_provider.supports_n and attempts > 1:
+                # Providers that answer n samples per call get each conversation's attempts in one request
+                futures = [executor.submit(self._generate_all, model_provider, i, attempts, time.perf_counter())
+                           for i in range(len(conversations))]
+            else:
+                futures = [
+                    executor.submit(self._generate, model_provider, i, attempt, time.perf_counter())
+                    for i in range(len(conversations))
+                    for attempt in range(attempts)
+                ]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error processing future: {str(e)}")
+
+        for _ in judges:
+            self.queue.put(_DONE)
+        for judge in judges:
+            judge.join()
+        progress.close()
+        return self._finish()
+
+    def _finish(self) -> List[Dict]:
+        conversations = self.data_loader.conversations
+        # Results arrive in completion order; restore the (question, attempt) order of the batch path
+        order = {c.question_id: n for n, c in enumerate(conversations)}
+        self.evaluator.results.sort(key=lambda r: (order.get(r['question_id'], len(order)), r['attempt']))
+        return self.evaluator._finalize_results()
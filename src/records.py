@@ -0,0 +1,336 @@
+import tempfile
+import threading
+from array import array
+from collections.abc import Mapping, MutableMapping, MutableSequence, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# Directory in which text stores created from now on spill their text, or None to keep text in memory
+_spill = {'directory': None}
+
+
+def configure_spill(directory: Optional[str]):
+    """Spill response and reasoning text created from now on to temporary files in `directory`."""
+    _spill['directory'] = directory
+
+
+class TextStore:
+    """Append-only store of strings addressed by integer reference.
+
+    With a spill directory, text is written to an anonymous temporary file and read back on access,
+    so resident memory per string is two array entries regardless of its length.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        directory = directory or _spill['directory']
+        self._lock = threading.Lock()
+        self._texts: Optional[List[str]] = None if directory else []
+        if directory:
+            self._file = tempfile.TemporaryFile(dir=directory)
+            self._offsets = array('q')
+            self._lengths = array('q')
+            self._size = 0
+
+    def put(self, text: str) -> int:
+        with self._lock:
+            if self._texts is not None:
+                self._texts.append(text)
+                return len(self._texts) - 1
+            data = text.encode('utf-8')
+            self._file.seek(self._size)
+            self._file.write(data)
+            self._offsets.append(self._size)
+            self._lengths.append(len(data))
+            self._size += len(data)
+            return len(self._offsets) - 1
+
+    def get(self, ref: int) -> str:
+        with self._lock:
+            if self._texts is not None:
+                return self._texts[ref]
+            self._file.seek(self._offsets[ref])
+            return self._file.read(self._lengths[ref]).decode('utf-8')
+
+
+class TextList(MutableSequence):
+    """List of optional strings, e.g. one conversation's responses, holding only references into a TextStore."""
+
+    __slots__ = ('_store', '_refs')
+
+    def __init__(self, store: TextStore, values: Iterable[Optional[str]] = ()):
+        self._store = store
+        self._refs = array('q')
+        self.extend(values)
+
+    def _ref(self, value: Optional[str]) -> int:
+        return -1 if value is None else self._store.put(str(value))
+
+    def _value(self, ref: int) -> Optional[str]:
+        return None if ref < 0 else self._store.get(ref)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._value(ref) for ref in self._refs[index]]
+        return self._value(self._refs[index])
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            self._refs[index] = array('q', (self._ref(v) for v in value))
+        else:
+            self._refs[index] = self._ref(value)
+
+    def __delitem__(self, index):
+        del self._refs[index]
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def insert(self, index: int, value: Optional[str]):
+        self._refs.insert(index, self._ref(value))
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, TextList)):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class TextMap(MutableMapping):
+    """{key: string} mapping, e.g. one question's journaled responses by attempt, holding only references into a TextStore."""
+
+    __slots__ = ('_store', '_refs')
+
+    def __init__(self, store: TextStore, values: Optional[Mapping] = None):
+        self._store = store
+        self._refs: Dict[Any, int] = {}
+        if values:
+            self.update(values)
+
+    def __getitem__(self, key) -> str:
+        return self._store.get(self._refs[key])
+
+    def __setitem__(self, key, value: str):
+        self._refs[key] = self._store.put(str(value))
+
+    def __delitem__(self, key):
+        del self._refs[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._refs)
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def __contains__(self, key) -> bool:
+        return key in self._refs
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ResponseStore(MutableMapping):
+    """{question_id: responses} mapping whose response lists are stored as TextLists sharing one TextStore.
+
+    Lists assigned to it are converted on the way in, so `responses[qid] = [...]` and
+    `responses.setdefault(qid, []).append(...)` keep working.
+    """
+
+    def __init__(self, responses: Optional[Mapping] = None, store: Optional[TextStore] = None):
+        self.store = store or TextStore()
+        self._lists: Dict[Any, TextList] = {}
+        if responses:
+            self.update(responses)
+
+    def __getitem__(self, question_id) -> TextList:
+        return self._lists[question_id]
+
+    def __setitem__(self, question_id, responses: Iterable[Optional[str]]):
+        if not (isinstance(responses, TextList) and responses._store is self.store):
+            responses = TextList(self.store, responses)
+        self._lists[question_id] = responses
+
+    def __delitem__(self, question_id):
+        del self._lists[question_id]
+
+    def __iter__(self) -> Iterator:
+        return iter(self._lists)
+
+    def __len__(self) -> int:
+        return len(self._lists)
+
+    def __contains__(self, question_id) -> bool:
+        return question_id in self._lists
+
+    def setdefault(self, question_id, default=None):
+        if question_id not in self._lists:
+            self[question_id] = default if default is not None else []
+        return self._lists[question_id]
+
+
+class ResultRow(Mapping):
+    """Read-mostly dict view of one row of a ResultTable."""
+
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table: 'ResultTable', index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key: str):
+        return self._table._get(self._index, key)
+
+    def __setitem__(self, key: str, value: Any):
+        self._table._set(self._index, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table._keys(self._index))
+
+    def __len__(self) -> int:
+        return len(self._table._keys(self._index))
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+class ResultTable(Sequence):
+    """Array-backed table of per-attempt evaluation results.
+
+    Question IDs are stored as integer indices and the axis, verdict, pass criteria and final status as
+    interned codes; reasoning text lives in a TextStore. Rows are returned as ResultRow views, which
+    behave like the result dicts the table is filled with, so `append(result)` and `for result in table`
+    work as they do on a list of dicts.
+    """
+
+    FIELDS = ('question_id', 'axis', 'attempt', 'reasoning', 'verdict', 'pass_criteria', 'passed')
+    CODED = ('axis', 'verdict', 'pass_criteria', 'final_status')
+    KNOWN = frozenset(FIELDS + CODED)
+
+    def __init__(self, results: Iterable[Mapping] = (), store: Optional[TextStore] = None):
+        self.store = store or TextStore()
+        self._question_ids: List[Any] = []
+        self._question_index: Dict[Any, int] = {}
+        self._codes: List[Any] = [None]  # code 0 means the field is absent
+        self._code_index: Dict[Any, int] = {None: 0}
+        self._questions = array('i')
+        self._attempts = array('i')
+        self._passed = bytearray()
+        self._reasoning = array('q')
+        self._coded = {name: array('I') for name in self.CODED}
+        self._extra: Dict[int, Dict[str, Any]] = {}  # any other keys, by row
+        self._lock = threading.Lock()
+        self.extend(results)
+
+    def _code(self, value: Any) -> int:
+        code = self._code_index.get(value)
+        if code is None:
+            code = self._code_index[value] = len(self._codes)
+            self._codes.append(value)
+        return code
+
+    def _question(self, question_id: Any) -> int:
+        index = self._question_index.get(question_id)
+        if index is None:
+            index = self._question_index[question_id] = len(self._question_ids)
+            self._question_ids.append(question_id)
+        return index
+
+    def append(self, result: Mapping):
+        reasoning = result.get('reasoning')
+        reasoning_ref = -1 if reasoning is None else self.store.put(str(reasoning))
+        attempt = result.get('attempt', 'NA')
+        with self._lock:
+            row = len(self._questions)
+            self._questions.append(self._question(result['question_id']))
+            # Attempts are 0-based; -1 stands for 'NA' on results not tied to one attempt
+            self._attempts.append(attempt if isinstance(attempt, int) else -1)
+            self._passed.append(bool(result.get('passed', False)))
+            self._reasoning.append(reasoning_ref)
+            for name, column in self._coded.items():
+                column.append(self._code(result.get(name)))
+            if not self.KNOWN.issuperset(result):
+                self._extra[row] = {k: v for k, v in result.items() if k not in self.KNOWN}
+
+    def extend(self, results: Iterable[Mapping]):
+        for result in results:
+            self.append(result)
+
+    def _get(self, row: int, key: str) -> Any:
+        if key == 'question_id':
+            return self._question_ids[self._questions[row]]
+        if key == 'attempt':
+            attempt = self._attempts[row]
+            return 'NA' if attempt < 0 else attempt
+        if key == 'passed':
+            return bool(self._passed[row])
+        if key == 'reasoning':
+            ref = self._reasoning[row]
+            return None if ref < 0 else self.store.get(ref)
+        if key in self._coded:
+            code = self._coded[key][row]
+            if code == 0 and key == 'final_status':
+                raise KeyError(key)
+            return self._codes[code]
+        return self._extra.get(row, {})[key]
+
+    def _set(self, row: int, key: str, value: Any):
+        with self._lock:
+            if key == 'question_id':
+                self._questions[row] = self._question(value)
+            elif key == 'attempt':
+                self._attempts[row] = value if isinstance(value, int) else -1
+            elif key == 'passed':
+                self._passed[row] = bool(value)
+            elif key == 'reasoning':
+                self._reasoning[row] = -1 if value is None else self.store.put(str(value))
+            elif key in self._coded:
+                self._coded[key][row] = self._code(value)
+            else:
+                self._extra.setdefault(row, {})[key] = value
+
+    def iter_fields(self, *keys: str) -> Iterator[tuple]:
+        """Iterate the given fields of every row as tuples, decoding column by column instead of through row views."""
+        return zip(*(self._column(key) for key in keys))
+
+    def _column(self, key: str) -> Iterator:
+        if key == 'question_id':
+            return (self._question_ids[q] for q in self._questions)
+        if key == 'attempt':
+            return ('NA' if a < 0 else a for a in self._attempts)
+        if key == 'passed':
+            return (bool(p) for p in self._passed)
+        if key == 'reasoning':
+            return (None if ref < 0 else self.store.get(ref) for ref in self._reasoning)
+        if key in self._coded:
+            return (self._codes[code] for code in self._coded[key])
+        return (self._extra.get(row, {}).get(key) for row in range(len(self)))
+
+    def _keys(self, row: int) -> List[str]:
+        keys = list(self.FIELDS)
+        if self._coded['final_status'][row]:
+            keys.append('final_status')
+        return keys + list(self._extra.get(row, ()))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ResultRow(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('result index out of range')
+        return ResultRow(self, index)
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    def sort(self, key: Callable[[ResultRow], Any]):
+        """Reorder the rows in place, like list.sort."""
+        order = sorted(range(len(self)), key=lambda i: key(ResultRow(self, i)))
+        with self._lock:
+            self._questions = array('i', (self._questions[i] for i in order))
+            self._attempts = array('i', (self._attempts[i] for i in order))
+            self._passed = bytearray(self._passed[i] for i in order)
+            self._reasoning = array('q', (self._reasoning[i] for i in order))
+            self._coded = {name: array('I', (column[i] for i in order)) for name, column in self._coded.items()}
+            position = {old: new for new, old in enumerate(order)}
+            self._extra = {position[row]: extra for row, extra in self._extra.items()}
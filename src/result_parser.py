@@ -1,41 +1,101 @@
 from collections import defaultdict
-from typing import List, Dict
+from math import comb
+from typing import List, Dict, Iterable
 import csv
+from src.records import ResultTable
 
-class ResultParser:
-    def __init__(self, evaluation_results):
-        self.evaluation_results = evaluation_results
+def render_conversation(messages: List[Dict]) -> str:
+    """The conversation as written to the original_conversation column of the raw output."""
+    return "\n".join([f"{msg['role'].upper()}:\n{msg['content']}" for msg in messages])
+
+class ScoreAggregator:
+    """Single-pass, incremental aggregation of evaluation results into per-question, per-axis and overall scores."""
+
+    def __init__(self, results: Iterable[Dict] = ()):
+        self.question_counts = {}  # question_id -> [attempts, passes]
+        self.axis_questions = {}   # axis -> {question_id: passed on any attempt}
+        self.extend(results)
+
+    def add(self, result: Dict):
+        """Fold one result into the running counts in O(1)."""
+        self._add(result['question_id'], result['axis'], bool(result['passed']))
+
+    def _add(self, question_id, axis: str, passed: bool):
+        counts = self.question_counts.get(question_id)
+        if counts is None:
+            counts = self.question_counts[question_id] = [0, 0]
+        counts[0] += 1
+        counts[1] += passed
+
+        # Each question is counted once per axis and passes if any of its attempts passed
+        questions = self.axis_questions.setdefault(axis, {})
+        questions[question_id] = questions.get(question_id, False) or passed
+
+    def extend(self, results: Iterable[Dict]):
+        if isinstance(results, ResultTable):
+            for question_id, axis, passed in results.iter_fields('question_id', 'axis', 'passed'):
+                self._add(question_id, axis, passed)
+            return
+        for result in results:
+            self.add(result)
+
+    def final_status(self, question_id) -> str:
+        attempts, passes = self.question_counts[question_id]
+        return f"{'PASS' if passes > 0 else 'FAIL'} ({passes}/{attempts} attempts passed)"
 
-    def calculate_scores(self):
-        # Group results by question_id
-        question_results = defaultdict(list)
-        for result in self.evaluation_results:
-            question_results[result['question_id']].append(result['passed'])  # Use 'passed' instead of checking verdict
-
-        # Initialize axis_counts with a set for tracking counted questions
-        axis_counts = defaultdict(lambda: {'passed': 0, 'total': 0, 'counted': set()})
-        
-        for result in self.evaluation_results:
-            question_id = result['question_id']
-            axis = result['axis']
-            
-            # Only count each question once per axis
-            if question_id not in axis_counts[axis]['counted']:
-                axis_counts[axis]['total'] += 1
-                axis_counts[axis]['counted'].add(question_id)
-                
-                # If any attempt for this question passed, count it as passed
-                if any(r['passed'] for r in self.evaluation_results 
-                      if r['question_id'] == question_id and r['axis'] == axis):
-                    axis_counts[axis]['passed'] += 1
-
-        axis_scores = {axis: (scores['passed'] / scores['total']) * 100 for axis, scores in axis_counts.items()}
-        overall_score = sum(axis_scores.values())/len(axis_scores.keys())
+    @staticmethod
+    def pass_at_k_estimate(n: int, c: int, k: int) -> float:
+        """Unbiased pass@k estimate from n attempts with c passes: 1 - C(n-c, k) / C(n, k)."""
+        if n - c < k:
+            return 1.0
+        return 1.0 - comb(n - c, k) / comb(n, k)
 
+    def pass_at_k(self, k: int) -> Dict:
+        """Per-axis and overall pass@k (in percent), averaged over questions with at least k attempts."""
+        axis_scores = {}
+        for axis, questions in self.axis_questions.items():
+            estimates = [self.pass_at_k_estimate(*self.question_counts[q], k)
+                         for q in questions if self.question_counts[q][0] >= k]
+            if estimates:
+                axis_scores[axis] = sum(estimates) / len(estimates) * 100
+        overall_score = sum(axis_scores.values()) / len(axis_scores) if axis_scores else 0.0
+        return {"overall_score": overall_score, "axis_scores": axis_scores}
+
+    def scores(self) -> Dict:
+        axis_scores = {axis: (sum(questions.values()) / len(questions)) * 100
+                       for axis, questions in self.axis_questions.items()}
+        overall_score = sum(axis_scores.values()) / len(axis_scores) if axis_scores else 0.0
         return {
             "overall_score": overall_score,
             "axis_scores": axis_scores
         }
+
+
+class ResultParser:
+    def __init__(self, evaluation_results=None):
+        # Results are held in a compact ResultTable; one passed in is shared rather than copied
+        if not isinstance(evaluation_results, ResultTable):
+            evaluation_results = ResultTable(evaluation_results or ())
+        self.evaluation_results = evaluation_results
+        self.aggregator = ScoreAggregator(self.evaluation_results)
+
+    def add_result(self, result: Dict):
+        """Add a single evaluation result as it streams in."""
+        self.evaluation_results.append(result)
+        self.aggregator.add(result)
+
+    def consume(self, results: Iterable[Dict]):
+        """Add results from any iterable, e.g. a generator streaming them from disk."""
+        for result in results:
+            self.add_result(result)
+
+    def calculate_scores(self, k_values: Iterable[int] = ()):
+        """Return overall and per-axis scores (pass if any attempt passed), plus pass@k for each requested k."""
+        scores = self.aggregator.scores()
+        k_values = list(k_values)
+        if k_values:
+            scores["pass_at_k"] = {k: self.aggregator.pass_at_k(k) for k in k_values}
+        return scores
     
     def save_raw_output(self, output_file: str, conversations: List, responses: Dict, attempts: int):
         """Save detailed raw output including all conversations, responses, and evaluations to a CSV file."""
@@ -57,13 +117,15 @@ class ResultParser:
                 conv_results = results_by_question.get(question_id, [])
 
                 # Prepare the original conversation
-                original_conversation = "\n".join([f"{msg['role'].upper()}:\n{msg['content']}" for msg in conv.conversation])
+                original_conversation = render_conversation(conv.conversation)
 
                 passed_attempts = sum(1 for result in conv_results if result.get('passed', False))
                 final_result = 'PASS' if passed_attempts > 0 else 'FAIL'
 
+                # Pair each response with the verdict for its attempt, whatever order the results arrived in
+                by_attempt = {result['attempt']: result for result in conv_results}
                 for i in range(attempts):
-                    result = conv_results[i] if i < len(conv_results) else {}
+                    result = by_attempt.get(i, {})
                     writer.writerow({
                         'question_id': question_id,
                         'axis': conv.axis,
@@ -0,0 +1,204 @@
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from src.baseline import fingerprint
+from src.result_parser import ScoreAggregator
+
+
+class ResultsStore:
+    """Columnar, normalized store of evaluation runs.
+
+    Each version of a conversation is written once to `conversations.jsonl` at the store root, keyed by
+    a fingerprint of its content. Each run gets `runs/<run_id>/` holding `run.json`, the fingerprints of
+    the conversations it was scored on, and one file per column of its per-attempt table, so readers load
+    only the columns they ask for. Low-cardinality string columns are dictionary
+    encoded, and response and reasoning text live in their own columns, which dashboards never
+    have to touch.
+    """
+
+    CONVERSATIONS_FILE = 'conversations.jsonl'
+    RUN_CONVERSATIONS_FILE = 'conversations.json'
+    COLUMNS = ['question_id', 'axis', 'attempt', 'verdict', 'passed', 'model_response', 'reasoning']
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(os.path.join(root, 'runs'), exist_ok=True)
+
+    def _run_dir(self, run_id: str) -> str:
+        return os.path.join(self.root, 'runs', run_id)
+
+    def run_ids(self) -> List[str]:
+        return sorted(os.listdir(os.path.join(self.root, 'runs')))
+
+    def has_run(self, run_id: str) -> bool:
+        return os.path.exists(self._run_dir(run_id))
+
+    @staticmethod
+    def _fingerprint(record: Dict) -> str:
+        content = {k: v for k, v in record.items() if k != 'fingerprint'}
+        return fingerprint(json.dumps(content, sort_keys=True, ensure_ascii=False))
+
+    def _read_conversation_records(self) -> Iterable[Dict]:
+        path = os.path.join(self.root, self.CONVERSATIONS_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                record = json.loads(line)
+                # Stores written before conversations were versioned have no fingerprint
+                record.setdefault('fingerprint', self._fingerprint(record))
+                yield record
+
+    def _write_conversations(self, conversations: List[Any]) -> List[List[Any]]:
+        """Append conversations not stored in this exact form yet; return [question_id, fingerprint] pairs for the run."""
+        stored = {record['fingerprint'] for record in self._read_conversation_records()}
+        versions = []
+        with open(os.path.join(self.root, self.CONVERSATIONS_FILE), 'a', encoding='utf-8') as f:
+            for conv in conversations:
+                record = {
+                    'question_id': conv.question_id,
+                    'axis': conv.axis,
+                    'conversation': conv.conversation,
+                    'target_question': conv.target_question,
+                    'pass_criteria': conv.pass_criteria
+                }
+                record['fingerprint'] = self._fingerprint(record)
+                versions.append([conv.question_id, record['fingerprint']])
+                if record['fingerprint'] in stored:
+                    continue
+                stored.add(record['fingerprint'])
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return versions
+
+    @staticmethod
+    def _encode(values: List[Any]) -> Dict:
+        distinct = set(values) if all(isinstance(v, str) for v in values) else None
+        if distinct is not None and len(distinct) * 2 <= len(values):
+            dictionary = sorted(distinct)
+            index = {v: n for n, v in enumerate(dictionary)}
+            return {'dictionary': dictionary, 'codes': [index[v] for v in values]}
+        return {'values': values}
+
+    @staticmethod
+    def _decode(column: Dict) -> List[Any]:
+        if 'dictionary' in column:
+            dictionary = column['dictionary']
+            return [dictionary[code] for code in column['codes']]
+        return column['values']
+
+    def write_run(self, run_id: str, conversations: List[Any], responses: Dict, results: List[Dict],
+                  metadata: Dict = None, overwrite: bool = False):
+        """Store one run: conversations by reference, and one row per judged attempt.
+
+        An existing run with the same `run_id` is only replaced when `overwrite` is set.
+        """
+        run_dir = self._run_dir(run_id)
+        if self.has_run(run_id):
+            if not overwrite:
+                raise FileExistsError(f"Run {run_id} already exists in results store {self.root}")
+            shutil.rmtree(run_dir)
+        versions = self._write_conversations(conversations)
+        os.makedirs(run_dir)
+        with open(os.path.join(run_dir, self.RUN_CONVERSATIONS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(versions, f, ensure_ascii=False)
+
+        # Short columns are dictionary encoded in memory; the text columns are streamed to disk value by value
+        for name in ('question_id', 'axis', 'attempt', 'verdict', 'passed'):
+            values = list(self._column(results, name))
+            if name == 'passed':
+                values = [bool(value) for value in values]
+            with open(os.path.join(run_dir, f'{name}.json'), 'w', encoding='utf-8') as f:
+                json.dump(self._encode(values), f, ensure_ascii=False)
+        responses_column = (self._response(responses, question_id, attempt) for question_id, attempt
+                            in zip(self._column(results, 'question_id'), self._column(results, 'attempt')))
+        self._write_streamed(os.path.join(run_dir, 'model_response.json'), responses_column)
+        self._write_streamed(os.path.join(run_dir, 'reasoning.json'), self._column(results, 'reasoning'))
+
+        with open(os.path.join(run_dir, 'run.json'), 'w', encoding='utf-8') as f:
+            json.dump(dict(metadata or {}, run_id=run_id, rows=len(results), created=time.time()), f, indent=2)
+
+    @staticmethod
+    def _column(results: Iterable[Dict], name: str) -> Iterator:
+        # ResultTables decode one column at a time without building row views
+        if hasattr(results, 'iter_fields'):
+            return (values[0] for values in results.iter_fields(name))
+        return (result[name] for result in results)
+
+    @staticmethod
+    def _write_streamed(path: str, values: Iterable[Any]):
+        """Write a plain column in the form `_decode` reads, one value at a time."""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"values": [')
+            for n, value in enumerate(values):
+                f.write((', ' if n else '') + json.dumps(value, ensure_ascii=False))
+            f.write(']}')
+
+    @staticmethod
+    def _response(responses: Dict, question_id: Any, attempt: Any) -> Optional[str]:
+        conv_responses = responses.get(question_id, [])
+        return conv_responses[attempt] if isinstance(attempt, int) and attempt < len(conv_responses) else None
+
+    def read_metadata(self, run_id: str) -> Dict:
+        with open(os.path.join(self._run_dir(run_id), 'run.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def read(self, columns: Optional[List[str]] = None, filters: Optional[Dict[str, Any]] = None,
+             run_ids: Optional[Iterable[str]] = None) -> Dict[str, List[Any]]:
+        """Read the attempt table column-wise across runs.
+
+        Only the requested `columns` (default: all but the text columns) and the columns named in
+        `filters` are loaded from disk. A filter value may be a single value or a set of accepted
+        values. The result always includes a `run_id` column.
+        """
+        columns = list(columns or [c for c in self.COLUMNS if c not in ('model_response', 'reasoning')])
+        filters = {k: (v if isinstance(v, (set, frozenset, list, tuple)) else {v}) for k, v in (filters or {}).items()}
+        needed = list(dict.fromkeys(columns + list(filters)))
+        unknown = [c for c in needed if c not in self.COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {unknown}")
+
+        output = {name: [] for name in ['run_id'] + columns}
+        for run_id in (run_ids if run_ids is not None else self.run_ids()):
+            loaded = {}
+            for name in needed:
+                with open(os.path.join(self._run_dir(run_id), f'{name}.json'), 'r', encoding='utf-8') as f:
+                    loaded[name] = self._decode(json.load(f))
+            rows = len(next(iter(loaded.values()))) if loaded else 0
+            keep = [n for n in range(rows) if all(loaded[k][n] in v for k, v in filters.items())]
+            output['run_id'].extend([run_id] * len(keep))
+            for name in columns:
+                values = loaded[name]
+                output[name].extend(values[n] for n in keep)
+        return output
+
+    def read_conversations(self, question_ids: Optional[Iterable[Any]] = None, run_id: Optional[str] = None) -> Dict[Any, Dict]:
+        """Return {question_id: conversation record}, optionally restricted to `question_ids`.
+
+        With `run_id`, each record is the version of the conversation that run was scored on; otherwise it
+        is the latest version stored.
+        """
+        wanted = set(question_ids) if question_ids is not None else None
+        versions = None
+        run_file = os.path.join(self._run_dir(run_id), self.RUN_CONVERSATIONS_FILE) if run_id is not None else None
+        if run_file is not None and os.path.exists(run_file):
+            with open(run_file, 'r', encoding='utf-8') as f:
+                versions = {question_id: version for question_id, version in json.load(f)}
+        conversations = {}
+        for record in self._read_conversation_records():
+            question_id = record['question_id']
+            if wanted is not None and question_id not in wanted:
+                continue
+            if versions is None or versions.get(question_id) == record['fingerprint']:
+                conversations[question_id] = record
+        return conversations
+
+    def axis_scores(self, run_ids: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+        """Per-run overall and per-axis scores, loading only question_id, axis and passed."""
+        table = self.read(columns=['question_id', 'axis', 'passed'], run_ids=run_ids)
+        aggregators = {}
+        for run_id, question_id, axis, passed in zip(table['run_id'], table['question_id'], table['axis'], table['passed']):
+            aggregator = aggregators.setdefault(run_id, ScoreAggregator())
+            aggregator.add({'question_id': question_id, 'axis': axis, 'passed': passed})
+        return {run_id: aggregator.scores() for run_id, aggregator in aggregators.items()}
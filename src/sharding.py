@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+from src.journal import config_changes
+from src.records import ResponseStore, ResultTable
+
+
+def shard_of(question_id: Any, num_shards: int) -> int:
+    """Stable shard assignment for a question, independent of input order and of the Python hash seed."""
+    digest = hashlib.sha256(str(question_id).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % num_shards
+
+
+class ShardedRun:
+    """A run split into `num_shards` shards by question_id hash, sharing one directory.
+
+    Each shard journals to its own subdirectory, so a killed shard resumes where it stopped when run again,
+    and writes `shard.jsonl` once finished. The shards can run as local processes or on separate machines
+    that share the directory; `merge` combines them in the benchmark's question order. `run.json` at the
+    root records the settings the shards were run with, so a directory is never reused for another run.
+    """
+
+    SHARD_FILE = 'shard.jsonl'
+    CONFIG_FILE = 'run.json'
+
+    def __init__(self, root: str, num_shards: int):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self.root = root
+        self.num_shards = num_shards
+        os.makedirs(root, exist_ok=True)
+
+    def shard_dir(self, index: int) -> str:
+        return os.path.join(self.root, f"shard-{index:04d}-of-{self.num_shards:04d}")
+
+    def select(self, conversations: List[Any], index: int) -> List[Any]:
+        """The conversations belonging to shard `index`, in their original order."""
+        return [c for c in conversations if shard_of(c.question_id, self.num_shards) == index]
+
+    def claim(self, config: Dict):
+        """Record `config` for a new sharded run, or check it against the run already in this directory.
+
+        Raises ValueError if the directory holds shards run with different settings, or shards with no config.
+        """
+        path = os.path.join(self.root, self.CONFIG_FILE)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                changed = config_changes(json.load(f), config)
+            if changed:
+                raise ValueError(f"{self.root} holds shards run with different settings ({', '.join(changed)})")
+            return
+        if any(name.startswith('shard-') for name in os.listdir(self.root)):
+            raise ValueError(f"{self.root} holds shards from an unknown run")
+        # Shards on other machines may claim the directory at the same time; each writes the same file
+        with open(f"{path}.{os.getpid()}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=2)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    def is_complete(self, index: int) -> bool:
+        return os.path.exists(os.path.join(self.shard_dir(index), self.SHARD_FILE))
+
+    def pending(self) -> List[int]:
+        return [i for i in range(self.num_shards) if not self.is_complete(i)]
+
+    def write_shard(self, index: int, conversations: List[Any], responses: Dict[Any, List[str]], results: List[Dict]):
+        """Write the finished shard, one line per conversation; the rename marks the shard complete."""
+        by_question = {}
+        for result in results:
+            by_question.setdefault(result['question_id'], []).append(result)
+        path = os.path.join(self.shard_dir(index), self.SHARD_FILE)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            for convo in conversations:
+                record = {
+                    'question_id': convo.question_id,
+                    'responses': list(responses.get(convo.question_id, [])),
+                    'results': [dict(result) for result in by_question.get(convo.question_id, [])]
+                }
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + '.tmp', path)
+
+    def merge(self, conversations: List[Any]) -> Tuple[ResponseStore, ResultTable]:
+        """Combine all shards into (responses, results) ordered as `conversations`, as if run in one process."""
+        missing = self.pending()
+        if missing:
+            raise RuntimeError(f"Shards {missing} of {self.num_shards} in {self.root} have not finished")
+        # Index each question's line by offset, then read the lines back in benchmark order
+        files = [open(os.path.join(self.shard_dir(index), self.SHARD_FILE), 'rb') for index in range(self.num_shards)]
+        try:
+            offsets = {}
+            for handle in files:
+                offset = handle.tell()
+                for line in iter(handle.readline, b''):
+                    offsets[json.loads(line)['question_id']] = (handle, offset)
+                    offset = handle.tell()
+            responses, results = ResponseStore(), ResultTable()
+            for convo in conversations:
+                if convo.question_id not in offsets:
+                    raise RuntimeError(f"Question {convo.question_id} is missing from the shards in {self.root}")
+                handle, offset = offsets[convo.question_id]
+                handle.seek(offset)
+                record = json.loads(handle.readline())
+                responses[convo.question_id] = record['responses']
+                results.extend(record['results'])
+        finally:
+            for handle in files:
+                handle.close()
+        return responses, results
+
+    def launch(self, argv: Sequence[str], indices: List[int], max_processes: int, poll_interval: float = 1.0):
+        """Run `main.py argv --shard-index i` for each index as local subprocesses, at most `max_processes` at once."""
+        script = os.path.abspath(sys.argv[0])
+        waiting = list(indices)
+        running, failed = {}, []
+        while waiting or running:
+            while waiting and len(running) < max_processes:
+                index = waiting.pop(0)
+                command = [sys.executable, script, *argv, '--shard-index', str(index)]
+                running[index] = subprocess.Popen(command, env={**os.environ, 'SHARD_INDEX': str(index)})
+            for index, process in list(running.items()):
+                if process.poll() is not None:
+                    del running[index]
+                    if process.returncode != 0:
+                        failed.append(index)
+            time.sleep(poll_interval if running else 0)
+        if failed:
+            raise RuntimeError(f"Shards {sorted(failed)} failed; run again to resume them")